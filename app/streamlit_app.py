@@ -1,117 +1,265 @@
 # -*- coding: utf-8 -*-
-import os, json, hashlib
-from datetime import datetime, date, time
+import os, sys, json, hashlib, html, math, time
+from datetime import datetime, timedelta
 import streamlit as st
 
-ROOT = os.path.dirname(os.path.dirname(__file__))
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from common import display, facets, occurrences, search, store  # noqa: E402
+
 EVENTS_PATH = os.path.join(ROOT, "data", "events.json")
 MANUAL_PATH = os.path.join(ROOT, "data", "manual_events.json")
+STORE_PATH = os.path.join(ROOT, "data", "events.sqlite")
+SEARCH_PATH = os.path.join(ROOT, "data", "search_index.json")
+FACETS_PATH = os.path.join(ROOT, "data", "facets.json")
+OCCURRENCES_PATH = os.path.join(ROOT, "data", "occurrences.json")
 
 st.set_page_config(page_title="Agenda cultural · Málaga", page_icon="🖼️", layout="wide")
 
 st.title("Agenda cultural · Málaga (MVP)")
 st.caption("Fuente inicial: Museo Picasso Málaga. Próximamente: Thyssen, Pompidou…")
 
-# --- Utilities ---------------------------------------------------------------
-MESES = ["ene","feb","mar","abr","may","jun","jul","ago","sep","oct","nov","dic"]
-DIAS  = ["lun","mar","mié","jue","vie","sáb","dom"]
-
-def fmt_fecha_rango(d1: str, d2: str) -> str:
-    y1, m1, d_1 = d1.split("-")
-    y2, m2, d_2 = d2.split("-")
-    m1n, m2n = int(m1), int(m2)
-    if d1 == d2:
-        return f"{int(d_1)} {MESES[m1n-1]} {y1}"
-    if y1 == y2 and m1 == m2:
-        return f"{int(d_1)}–{int(d_2)} {MESES[m1n-1]} {y1}"
-    if y1 == y2:
-        return f"{int(d_1)} {MESES[m1n-1]} – {int(d_2)} {MESES[m2n-1]} {y1}"
-    return f"{int(d_1)} {MESES[m1n-1]} {y1} – {int(d_2)} {MESES[m2n-1]} {y2}"
-
-def fmt_horario(dt1: str, dt2: str, all_day: bool) -> str:
-    # dt in ISO with TZ e.g., 2025-09-20T11:00:00+02:00
-    d1 = datetime.fromisoformat(dt1.replace("Z","+00:00"))
-    d2 = datetime.fromisoformat(dt2.replace("Z","+00:00"))
-    dia = DIAS[d1.weekday()]
-    if all_day:
-        return f"{dia} {d1.day} {MESES[d1.month-1]} {d1.year} · todo el día"
-    if d1.date() == d2.date():
-        return f"{dia} {d1.day} {MESES[d1.month-1]} {d1.year} · {d1.strftime('%H:%M')}–{d2.strftime('%H:%M')}"
-    return f"{dia} {d1.day} {MESES[d1.month-1]} {d1.year} · {d1.strftime('%H:%M')} → {d2.day} {MESES[d2.month-1]} {d2.year} {d2.strftime('%H:%M')}"
-
-@st.cache_data(ttl=0, show_spinner=False)
-def load_events():
+# --- Carga de datos -----------------------------------------------------------
+# Cada fichero se identifica por su versión: el hash de su contenido, que solo se
+# recalcula cuando cambian su mtime o su tamaño. Las cachés van por versión: un
+# fichero se vuelve a leer solo si cambió en disco (sin ttl ni vaciados globales)
+# y, con cache_resource, datos, índices y vistas se comparten entre sesiones.
+# Lo que devuelven es compartido: no se modifica.
+@st.cache_resource(show_spinner=False, max_entries=32)
+def _digest(path: str, mtime_ns: int, size: int) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def file_version(path: str) -> str:
+    """Hash del contenido ("" si no existe); por run solo cuesta un stat()."""
     try:
-        with open(EVENTS_PATH, "r", encoding="utf-8") as f:
+        info = os.stat(path)
+    except OSError:
+        return ""
+    return _digest(path, info.st_mtime_ns, info.st_size)
+
+def _read_json(path: str, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
             return json.load(f)
     except Exception:
-        return []
+        return default
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_events(ev: str) -> list:
+    events = _read_json(EVENTS_PATH, [])
+    # events.json antiguos (sin campos precalculados): se derivan una vez al cargar
+    for e in events:
+        if "ts_end" not in e:
+            e.update(display.derive(e) or {})
+    return events
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def events_by_id(ev: str) -> dict:
+    return {e["id"]: e for e in load_events(ev)}
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_manual(mv: str) -> list:
+    return _read_json(MANUAL_PATH, [])
+
+def _index_data(path: str, version: int, build, ev: str) -> dict:
+    # Índice que genera el recolector; si falta o es de otra versión se
+    # construye aquí a partir de events.json
+    data = _read_json(path, None)
+    if isinstance(data, dict) and data.get("version") == version:
+        return data
+    return build(load_events(ev))
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def search_index(sv: str, ev: str) -> dict:
+    return _index_data(SEARCH_PATH, search.INDEX_VERSION, search.build, ev)
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def facet_index(fv: str, ev: str) -> facets.FacetIndex:
+    return facets.FacetIndex(_index_data(FACETS_PATH, facets.FACETS_VERSION, facets.build, ev))
+
+@st.cache_resource(show_spinner=False, max_entries=2)
+def occurrence_index(ov: str, ev: str) -> occurrences.OccurrenceIndex:
+    # Ocurrencias por día (días sueltos de las actividades, no su rango mín–máx)
+    return occurrences.OccurrenceIndex(
+        _index_data(OCCURRENCES_PATH, occurrences.INDEX_VERSION, occurrences.build, ev))
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def search_ids(query: str, sv: str, ev: str):
+    """Ids que casan con la búsqueda (None = sin búsqueda)."""
+    ids = search.search(search_index(sv, ev), query)
+    return None if ids is None else frozenset(ids)
 
-events = load_events()
+@st.cache_resource(show_spinner=False, max_entries=64)
+def matching_ids(query: str, dates, ver: tuple):
+    """Ids que casan con la búsqueda y ocurren entre `dates` (None = sin filtro)."""
+    ev, sv, fv, ov = ver[:4]
+    ids = search_ids(query, sv, ev)
+    if dates:
+        on = occurrence_index(ov, ev).between(*dates)
+        ids = frozenset(on) if ids is None else ids & on
+    return ids
 
-# --- Controls (filters off for now) -----------------------------------------
-cols = st.columns([1,1,1,1,1])
+@st.cache_resource(show_spinner=False, max_entries=2)
+def open_store(version: str):
+    # Si existe data/events.sqlite se consulta por ventanas; si no, events.json.
+    # Por versión: si el fichero se sustituye (git pull, redeploy) se reabre.
+    return store.connect(STORE_PATH)
+
+# --- Controls -----------------------------------------------------------------
+PAGE_SIZES = [10, 20, 50, 100]
+WINDOWS = {"Todos": None, "7 días": 7, "30 días": 30, "90 días": 90}
+TYPES = {"exhibition": "Exposiciones", "activity": "Actividades"}
+WHEN = ["Cualquier fecha", "Hoy", "Este fin de semana", "Esta semana", "Elegir fechas…"]
+
+# Versiones de los ficheros de datos en este run: (events, search, facets,
+# occurrences, sqlite). Si el recolector los reescribe, las cachés cambian solas.
+ev, sv, fv, ov = (file_version(p) for p in (EVENTS_PATH, SEARCH_PATH, FACETS_PATH, OCCURRENCES_PATH))
+ver = (ev, sv, fv, ov, file_version(STORE_PATH))
+
+cols = st.columns([1,1,1,1,1,1])
 with cols[0]:
+    # Las cachés ya siguen a los ficheros: recargar es solo volver a ejecutar
     if st.button("🔄 Recargar datos", use_container_width=True):
-        st.cache_data.clear()
-        st.experimental_rerun()
+        st.rerun()
 with cols[1]:
     show_past = st.toggle("Mostrar pasados", value=False)
+with cols[2]:
+    window = st.selectbox("Próximos", list(WINDOWS))
+    days = WINDOWS[window]
+with cols[3]:
+    page_size = st.selectbox("Por página", PAGE_SIZES, index=1)
+
+query = st.text_input("Buscar", placeholder="Título, descripción o sede (p. ej. «pica»)").strip()
+
+fx = facet_index(fv, ev)
+fcols = st.columns([2,2,1,2])
+with fcols[0]:
+    institutions = st.multiselect("Sede", sorted(fx.institution_names, key=fx.institution_names.get),
+                                  format_func=lambda i: fx.institution_names.get(i, i))
+with fcols[1]:
+    types = st.multiselect("Tipo", list(TYPES), format_func=TYPES.get)
+with fcols[2]:
+    when = st.selectbox("Fechas", WHEN)
+today = datetime.now(display.TZ).date()
+dates = None   # (primer día, último día) en ISO
+if when == WHEN[1]:
+    dates = (today.isoformat(), today.isoformat())
+elif when == WHEN[2]:
+    dates = tuple(d.isoformat() for d in occurrences.weekend_of(today))
+elif when == WHEN[3]:
+    dates = tuple(d.isoformat() for d in occurrences.week_of(today))
+elif when == WHEN[4]:
+    with fcols[3]:
+        picked = st.date_input("Entre", value=(today, today + timedelta(days=7)))
+    if isinstance(picked, (tuple, list)) and picked:
+        dates = (picked[0].isoformat(), picked[-1].isoformat())
+filters = {"institutions": tuple(institutions), "types": tuple(types)}
 
 st.divider()
 
 # --- List (cards) ------------------------------------------------------------
-def is_past(e: dict) -> bool:
-    if e.get("type") == "exhibition":
-        return e.get("date_end","9999") < datetime.now().strftime("%Y-%m-%d")
-    else:
-        return e.get("datetime_end","9999") < datetime.now().isoformat()
-
-shown = 0
-for e in sorted(events, key=lambda x: (x.get("date_start") or x.get("datetime_start") or "9999", x.get("title",""))):
-    if not show_past and is_past(e):
-        continue
+@st.cache_resource(show_spinner=False, max_entries=32)
+def build_view(ver: tuple, show_past: bool, days, now_minute: int, query: str = "", dates=None,
+               **filters) -> list:
+    """
+    Lista filtrada y ordenada (modo events.json); una vez por versión de los
+    datos, filtro y minuto, compartida por todas las sesiones.
+    Sin recorrer los eventos: intersección de facetas y búsquedas binarias.
+    """
+    ev, sv, fv, ov = ver[:4]
+    fx = facet_index(fv, ev)
+    docs = fx.select(not_before=None if show_past else now_minute,
+                     start_before=now_minute + days * 86400 if days else None,
+                     ids=matching_ids(query, dates, ver), **filters)
+    by_id = events_by_id(ev)
+    return [by_id[fx.ids[d]] for d in docs if fx.ids[d] in by_id]
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def count_events(ver: tuple, show_past: bool, days, now_minute: int, query: str = "", dates=None,
+                 **filters) -> int:
+    conn = open_store(ver[4])
+    if conn is None:
+        return len(build_view(ver, show_past, days, now_minute, query, dates, **filters))
+    return store.count(conn, now_minute, show_past, days, ids=matching_ids(query, dates, ver), **filters)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def page_events(ver: tuple, show_past: bool, days, now_minute: int, page_size: int, page: int,
+                query: str = "", dates=None, **filters) -> list:
+    start = (page - 1) * page_size
+    conn = open_store(ver[4])
+    if conn is None:
+        return build_view(ver, show_past, days, now_minute, query, dates, **filters)[start:start + page_size]
+    return store.upcoming(conn, now_minute, show_past, days, limit=page_size, offset=start,
+                          ids=matching_ids(query, dates, ver), **filters)
+
+def card_image(e: dict):
+    # Miniatura local si el recolector la generó (app/static se sirve como
+    # estático en /app/static/...); si no, la imagen original.
+    thumb = e.get("thumb_path")
+    url = thumb if thumb and os.path.exists(os.path.join(ROOT, thumb)) else e["image_url"]
+    # <img loading="lazy">: el navegador no descarga las imágenes fuera de pantalla
+    st.markdown(f'<img src="{html.escape(url, quote=True)}" loading="lazy" style="width:100%">',
+                unsafe_allow_html=True)
+
+now_ts = time.time()
+now_minute = int(now_ts // 60) * 60
+total = count_events(ver, show_past, days, now_minute, query, dates, **filters)
+pages = max(1, math.ceil(total / page_size))
+with cols[4]:
+    page = st.number_input("Página", min_value=1, max_value=pages, value=1, step=1,
+                           key="page-" + hashlib.sha1(repr((show_past, days, page_size, query, dates, filters)).encode()).hexdigest()[:12])
+with cols[5]:
+    st.caption(f"{total} eventos · {pages} página(s)")
+
+for e in page_events(ver, show_past, days, now_minute, page_size, page, query, dates, **filters):
     with st.container():
         cols = st.columns([1,3])
         with cols[0]:
             if e.get("image_url"):
-                st.image(e["image_url"], use_column_width=True)
+                card_image(e)
         with cols[1]:
             st.subheader(e.get("title","(sin título)"))
             st.caption(e.get("institution_name",""))
-            # date line
-            if e.get("type") == "exhibition":
-                line = fmt_fecha_rango(e["date_start"], e["date_end"])
-                # badge en curso
-                today = datetime.now().strftime("%Y-%m-%d")
-                if e["date_start"] <= today <= e["date_end"]:
-                    st.markdown(f"**{line}** · 🟢 *En curso*")
-                else:
-                    st.markdown(f"**{line}**")
+            # date line (precalculada por el recolector)
+            line = e.get("date_label", "")
+            # badge en curso
+            if e.get("type") == "exhibition" and e.get("ts_start", now_ts + 1) <= now_ts <= e.get("ts_end", 0):
+                st.markdown(f"**{line}** · 🟢 *En curso*")
             else:
-                st.markdown(f"**{fmt_horario(e['datetime_start'], e['datetime_end'], e.get('all_day', False))}**")
+                st.markdown(f"**{line}**")
             if e.get("description"):
                 st.write(e["description"])
             if e.get("url"):
                 st.link_button("Ficha oficial", e["url"], use_container_width=False)
         st.divider()
-        shown += 1
 
-if shown == 0:
+if not total and query:
+    st.info(f"Ningún evento coincide con «{query}».")
+elif not total:
     st.info("De momento no hay eventos para mostrar. Prueba a activar 'Mostrar pasados' o vuelve más tarde.")
 
 # --- Manual editor (optional) -----------------------------------------------
 with st.expander("✍️ Alta/edición manual (avanzado)"):
-    try:
-        with open(MANUAL_PATH, "r", encoding="utf-8") as f:
-            manual = json.load(f)
-    except Exception:
-        manual = []
+    # Se lee una vez por versión del fichero (no en cada rerun)
+    manual = load_manual(file_version(MANUAL_PATH))
     edited = st.data_editor(manual, num_rows="dynamic", use_container_width=True)
     if st.button("💾 Guardar manual_events.json"):
-        try:
-            with open(MANUAL_PATH, "w", encoding="utf-8") as f:
-                json.dump(edited, f, ensure_ascii=False, indent=2)
-            st.success("Guardado. (Si estás en Streamlit Cloud, recuerda *commit* para persistir cambios.)")
-        except Exception as ex:
-            st.error(f"No se pudo guardar: {ex}")
+        if edited == manual:
+            st.info("Sin cambios: no se reescribe el fichero.")
+        else:
+            try:
+                # escritura atómica; el nuevo mtime/hash invalida solo la entrada
+                # de load_manual (los eventos y vistas no dependen de este fichero)
+                tmp = MANUAL_PATH + ".tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump(edited, f, ensure_ascii=False, indent=2)
+                os.replace(tmp, MANUAL_PATH)
+                st.success("Guardado. (Si estás en Streamlit Cloud, recuerda *commit* para persistir cambios.)")
+            except Exception as ex:
+                st.error(f"No se pudo guardar: {ex}")
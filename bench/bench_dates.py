@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark + regresión del parser de fechas (scrapers/dates.py), sin red.
+- Comprueba cada texto de bench/dates_corpus.json contra su resultado esperado
+  (y, si el caso los enumera, contra sus días concretos).
+- Mide el rendimiento en frío (memo vacía) y en caliente (memo llena).
+
+Uso:
+    python bench/bench_dates.py [--rounds 200] [--json]
+Sale con código 1 si algún caso del corpus no coincide.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scrapers import dates  # noqa: E402
+
+CORPUS_PATH = os.path.join(ROOT, "bench", "dates_corpus.json")
+
+
+def load_corpus(path: str = CORPUS_PATH) -> list:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def check(corpus: list) -> list:
+    failures = []
+    for case in corpus:
+        got = dates.parse_date_range(case["text"])
+        got = list(got) if got else None
+        if got != case["expected"]:
+            failures.append({"text": case["text"], "expected": case["expected"], "got": got})
+            continue
+        # días concretos (solo en los casos que los enumeran)
+        spec = dates.parse_dates(case["text"])
+        days = list(spec[3]) if spec and spec[3] else None
+        if days != case.get("days"):
+            failures.append({"text": case["text"], "expected": case.get("days"), "got": days})
+    return failures
+
+
+def _clear():
+    dates.norm.cache_clear()
+    dates.parse_normalized.cache_clear()
+
+
+def throughput(texts: list, rounds: int, cold: bool) -> float:
+    """Textos parseados por segundo."""
+    _clear()
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        if cold:
+            _clear()
+        for t in texts:
+            dates.parse_date_range(t)
+    elapsed = time.perf_counter() - t0
+    return rounds * len(texts) / elapsed if elapsed else float("inf")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--rounds", type=int, default=200)
+    ap.add_argument("--json", action="store_true", help="salida en JSON")
+    args = ap.parse_args(argv)
+
+    corpus = load_corpus()
+    failures = check(corpus)
+    texts = [c["text"] for c in corpus]
+    result = {
+        "cases": len(corpus),
+        "failures": failures,
+        "cold_per_sec": round(throughput(texts, args.rounds, cold=True)),
+        "warm_per_sec": round(throughput(texts, args.rounds, cold=False)),
+    }
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print(f"corpus: {result['cases']} casos, {len(failures)} fallos")
+        for f in failures:
+            print(f"  [FAIL] {f['text']!r}: esperado {f['expected']}, obtenido {f['got']}")
+        print(f"frío:     {result['cold_per_sec']:>10,} textos/s")
+        print(f"caliente: {result['warm_per_sec']:>10,} textos/s")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
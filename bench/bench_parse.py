@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del parseo de listados MPM (scrapers/mpm.py), sin red.
+Para cada página (fixtures, incl. mpm_actividades_debug.html) mide el tiempo
+medio de parse_exhibitions/parse_activities por página y por tarjeta. Como
+referencia se mide también lo que costaba solo construir el árbol con
+BeautifulSoup (la versión anterior del scraper).
+
+Uso:
+    python bench/bench_parse.py [--rounds 50] [--json] [páginas.html ...]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scrapers import mpm  # noqa: E402
+
+FIXTURES_DIR = os.path.join(ROOT, "bench", "fixtures")
+DEFAULT_PAGES = [
+    os.path.join(FIXTURES_DIR, "mpm_exposiciones.html"),
+    os.path.join(FIXTURES_DIR, "mpm_actividades.html"),
+    os.path.join(FIXTURES_DIR, "mpm_actividades_debug.html"),
+]
+
+
+def _timeit(fn, rounds: int) -> float:
+    """Segundos medios por llamada."""
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - t0) / rounds
+
+
+def bench_page(path: str, rounds: int) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        html = f.read()
+    # el parser adecuado es el que encuentra tarjetas; si ninguno, actividades
+    exh = mpm.parse_exhibitions(html)
+    act = mpm.parse_activities(html)
+    kind, parse, cards = ("exhibitions", mpm.parse_exhibitions, len(exh)) if exh else \
+                         ("activities", mpm.parse_activities, len(act))
+    per_page = _timeit(lambda: parse(html), rounds)
+    row = {
+        "page": os.path.relpath(path, ROOT),
+        "bytes": len(html.encode("utf-8")),
+        "parser": kind,
+        "cards": cards,
+        "ms_per_page": round(per_page * 1000, 3),
+        "ms_per_card": round(per_page * 1000 / cards, 4) if cards else None,
+    }
+    try:
+        from bs4 import BeautifulSoup
+        row["bs4_build_ms"] = round(_timeit(lambda: BeautifulSoup(html, "lxml"), rounds) * 1000, 3)
+    except ImportError:
+        row["bs4_build_ms"] = None
+    return row
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("pages", nargs="*", default=DEFAULT_PAGES)
+    ap.add_argument("--rounds", type=int, default=50)
+    ap.add_argument("--json", action="store_true", help="salida en JSON")
+    args = ap.parse_args(argv)
+
+    rows = [bench_page(p, args.rounds) for p in args.pages if os.path.exists(p)]
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return 0
+
+    print(f"{'página':<42} {'KB':>6} {'tarjetas':>8} {'ms/pág':>8} {'ms/tarj':>8} {'bs4 ms':>8}")
+    for r in rows:
+        per_card = f"{r['ms_per_card']:.4f}" if r["ms_per_card"] is not None else "-"
+        bs4 = f"{r['bs4_build_ms']:.3f}" if r["bs4_build_ms"] is not None else "-"
+        print(f"{r['page']:<42} {r['bytes'] / 1024:>6.1f} {r['cards']:>8} "
+              f"{r['ms_per_page']:>8.3f} {per_card:>8} {bs4:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark del pipeline completo del recolector, sin red.
+- fetch_parse: reproduce las páginas de bench/fixtures a través de
+  scrapers.mpm.collect (scrapers.http en modo replay, sin caché).
+- normalize_merge / diff / serialize / store: las etapas de scripts/collect.py
+  sobre entradas sintéticas de N eventos (por defecto 10k y 100k).
+- dedupe: búsqueda de casi-duplicados (common/dedupe.py) de un 1% de entradas
+  manuales con título y URL retocados contra los N eventos.
+Para cada etapa informa segundos y pico de memoria (tracemalloc) en JSON.
+
+Uso:
+    python bench/bench_pipeline.py [--sizes 10000 100000] [--out resultados.json]
+"""
+import os
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for p in (ROOT, os.path.join(ROOT, "scripts")):
+    if p not in sys.path:
+        sys.path.insert(0, p)
+
+import collect  # noqa: E402
+from common import dedupe, store  # noqa: E402
+from scrapers import http, mpm  # noqa: E402
+
+FIXTURES_DIR = os.path.join(ROOT, "bench", "fixtures")
+INSTITUTION = {
+    "id": "mpm",
+    "base_url": mpm.BASE,
+    "endpoints": {"exhibitions": "/exposiciones", "activities": "/actividades"},
+}
+REPLAY = {
+    f"{mpm.BASE}/exposiciones": "mpm_exposiciones.html",
+    f"{mpm.BASE}/actividades": "mpm_actividades.html",
+}
+
+
+def _replay_source(url: str):
+    name = REPLAY.get(url)
+    if not name:
+        return None
+    with open(os.path.join(FIXTURES_DIR, name), "rb") as f:
+        return f.read()
+
+
+def measure(fn, memory: bool = True) -> dict:
+    """Ejecuta fn() una vez cronometrada y, si `memory`, otra con tracemalloc."""
+    gc.collect()
+    t0 = time.perf_counter()
+    result = fn()
+    row = {"seconds": round(time.perf_counter() - t0, 4)}
+    if memory:
+        gc.collect()
+        tracemalloc.start()
+        fn()
+        row["peak_kb"] = round(tracemalloc.get_traced_memory()[1] / 1024, 1)
+        tracemalloc.stop()
+    return row, result
+
+
+def synthetic_events(template: list, n: int, seed: int = 1) -> list:
+    """N eventos "scrapeados" variando URL, título y fechas de las plantillas."""
+    rnd = random.Random(seed)
+    base_day = date(2020, 1, 1)
+    out = []
+    for i in range(n):
+        e = dict(template[i % len(template)])
+        start = base_day + timedelta(days=rnd.randint(0, 3650))
+        end = start + timedelta(days=rnd.randint(0, 120))
+        e["url"] = f"{e['url']}-{i}"
+        e["title"] = f"{e['title']} #{i}"
+        e.pop("id", None)
+        if e["type"] == "exhibition":
+            e["date_start"], e["date_end"] = start.isoformat(), end.isoformat()
+        else:
+            e["datetime_start"] = f"{start.isoformat()}T00:00:00+02:00"
+            e["datetime_end"] = f"{end.isoformat()}T23:59:00+02:00"
+        out.append(e)
+    return out
+
+
+def bench_fetch_parse(rounds: int, memory: bool) -> dict:
+    http.configure(cache_dir=None)
+    with http.replay(_replay_source):
+        events = mpm.collect(INSTITUTION)
+        row, _ = measure(lambda: [mpm.collect(INSTITUTION) for _ in range(rounds)], memory)
+    row["seconds_per_run"] = round(row.pop("seconds") / rounds, 5)
+    row["events"] = len(events)
+    return row, events
+
+
+def bench_size(template: list, n: int, memory: bool, workdir: str) -> dict:
+    scraped = synthetic_events(template, n)
+    manual = [dict(e, source="manual") for e in scraped[: max(1, n // 100)]]
+    stages = {}
+
+    stages["normalize_merge"], merged = measure(lambda: collect.merge_events(scraped, manual), memory)
+
+    events_path = os.path.join(workdir, f"events_{n}.json")
+    stages["serialize"], _ = measure(lambda: collect.write_json(events_path, merged), memory)
+
+    # diff contra una versión anterior con ~1% de cambios
+    current = collect.merge_events(scraped[: n - n // 100] + synthetic_events(template, n // 100, seed=2), manual)
+    stages["diff"], delta = measure(
+        lambda: collect.diff_events(collect.load_previous(events_path), current), memory)
+
+    # manuales "casi iguales": otra URL y una palabra más en el título
+    near = [collect.normalize_event(dict(e, url=e["url"] + "?m", title=e["title"] + " (manual)", source="manual"))
+            for e in scraped[: max(1, n // 100)]]
+    stages["dedupe"], found = measure(lambda: dedupe.find_duplicates(near, merged), memory)
+
+    store_path = os.path.join(workdir, f"events_{n}.sqlite")
+    stages["store"], _ = measure(lambda: store.write(store_path, merged), memory)
+
+    return {
+        "events": len(merged),
+        "json_bytes": os.path.getsize(events_path),
+        "delta": {k: len(v) for k, v in delta.items()},
+        "duplicates_found": len(found),
+        "stages": stages,
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--rounds", type=int, default=20, help="repeticiones de fetch_parse")
+    ap.add_argument("--no-memory", action="store_true", help="sin pasada con tracemalloc")
+    ap.add_argument("--out", help="fichero JSON de salida (por defecto stdout)")
+    args = ap.parse_args(argv)
+    memory = not args.no_memory
+
+    fetch_parse, template = bench_fetch_parse(args.rounds, memory)
+    result = {
+        "python": platform.python_version(),
+        "fetch_parse": fetch_parse,
+        "sizes": {},
+    }
+    with tempfile.TemporaryDirectory() as workdir:
+        for n in args.sizes:
+            result["sizes"][str(n)] = bench_size(template, n, memory, workdir)
+
+    out = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(out + "\n")
+    else:
+        print(out)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+Detección de casi-duplicados entre eventos de distinto origen (manuales frente a
+scrapeados), sin comparar todos con todos:
+- los candidatos salen de un índice invertido por (palabra del título, semana de
+  inicio): cada evento solo se compara con los que comparten alguna palabra
+  significativa y empiezan en la misma semana o en una contigua;
+- filtrado por prefijo: para llegar a un Jaccard >= s dos títulos tienen que
+  compartir alguna de sus palabras más raras (las n - ceil(s·n) + 1 primeras por
+  frecuencia), así que las palabras comunes ("concierto", "taller") no se
+  recorren; los eventos con la misma URL se buscan aparte;
+- la similitud es la de Jaccard entre las palabras del título, con un extra si
+  la URL coincide. Solo se comparan eventos del mismo tipo cuyas fechas se
+  solapan (con un día de margen) y, si ambos la tienen, de la misma sede.
+"""
+from __future__ import annotations
+import math
+import re
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from common.search import MIN_TOKEN, fold
+
+WEEK = 7 * 86400
+DAY = 86400
+URL_BONUS = 0.2
+DEFAULT_MIN_SCORE = 0.5
+
+STOPWORDS = frozenset("""
+    de del la las el los en y con para por un una al a o lo se su sus e
+""".split())
+
+_WORD = re.compile(rf"[a-z0-9]{{{MIN_TOKEN},}}")   # como common.search.tokens, en una pasada
+
+
+def title_tokens(e: dict) -> FrozenSet[str]:
+    return frozenset(_WORD.findall(fold(e.get("title") or ""))).difference(STOPWORDS)
+
+
+def _week(e: dict) -> Optional[int]:
+    ts = e.get("ts_start")
+    return None if ts is None else int(ts // WEEK)
+
+
+def _compatible(a: dict, b: dict) -> bool:
+    if a.get("type") != b.get("type"):
+        return False
+    ia, ib = a.get("institution_id"), b.get("institution_id")
+    if ia and ib and ia != ib:
+        return False
+    # fechas solapadas con un día de margen
+    return (a.get("ts_start", 0) <= b.get("ts_end", 0) + DAY
+            and b.get("ts_start", 0) <= a.get("ts_end", 0) + DAY)
+
+
+def similarity(ta: FrozenSet[str], tb: FrozenSet[str], a: dict, b: dict) -> float:
+    if not ta or not tb:
+        return 0.0
+    score = len(ta & tb) / len(ta | tb)
+    if a.get("url") and a.get("url") == b.get("url"):
+        score += URL_BONUS
+    return round(min(1.0, score), 3)
+
+
+class DuplicateIndex:
+    """
+    Índice de los eventos de referencia (normalmente, los scrapeados). Si se dan
+    los eventos a comparar (`probes`), solo se indexan los de sus semanas y sus
+    URLs: el resto no puede ser candidato y ni siquiera se tokeniza.
+    """
+
+    def __init__(self, events: List[dict], probes: Optional[List[dict]] = None):
+        self.events = events
+        self._postings: Dict[int, Dict[str, List[int]]] = {}   # semana -> palabra -> docs
+        self._df: Dict[str, int] = {}            # en cuántos eventos aparece cada palabra
+        self._by_url: Dict[str, List[int]] = {}
+        self._tokens: Dict[int, FrozenSet[str]] = {}
+        weeks = urls = None
+        if probes is not None:
+            weeks = {w + d for w in map(_week, probes) if w is not None for d in (-1, 0, 1)}
+            urls = {p["url"] for p in probes if p.get("url")}
+        for doc, e in enumerate(events):
+            url = e.get("url")
+            if url and (urls is None or url in urls):
+                self._by_url.setdefault(url, []).append(doc)
+            week = _week(e)
+            if week is None or (weeks is not None and week not in weeks):
+                continue
+            toks = self._tokens[doc] = title_tokens(e)
+            by_tok = self._postings.setdefault(week, {})
+            df = self._df
+            for t in toks:
+                by_tok.setdefault(t, []).append(doc)
+                df[t] = df.get(t, 0) + 1
+
+    def candidates(self, e: dict, toks: FrozenSet[str], min_score: float = DEFAULT_MIN_SCORE) -> set:
+        out = set(self._by_url.get(e.get("url"), ())) if e.get("url") else set()
+        week = _week(e)
+        if week is None or not toks:
+            return out
+        rare = sorted(toks, key=lambda t: (self._df.get(t, 0), t))
+        prefix = len(rare) - math.ceil(min_score * len(rare)) + 1
+        for w in (week - 1, week, week + 1):
+            by_tok = self._postings.get(w)
+            if by_tok:
+                for t in rare[:max(1, prefix)]:
+                    docs = by_tok.get(t)
+                    if docs:
+                        out.update(docs)
+        return out
+
+    def best_match(self, e: dict, min_score: float = DEFAULT_MIN_SCORE) -> Optional[Tuple[dict, float]]:
+        """El evento indexado más parecido a `e` (y su puntuación), o None."""
+        toks = title_tokens(e)
+        best, best_score = None, min_score
+        for doc in self.candidates(e, toks, min_score):
+            other = self.events[doc]
+            if other.get("id") == e.get("id") or not _compatible(e, other):
+                continue
+            other_toks = self._tokens.get(doc)
+            if other_toks is None:   # fuera de las semanas indexadas (solo por URL)
+                other_toks = self._tokens[doc] = title_tokens(other)
+            score = similarity(toks, other_toks, e, other)
+            if score < best_score:
+                continue
+            # a igual puntuación gana el id menor (resultado determinista)
+            if best is None or score > best_score or other["id"] < best["id"]:
+                best, best_score = other, score
+        return (best, best_score) if best is not None else None
+
+
+def find_duplicates(events: List[dict], reference: List[dict],
+                    min_score: float = DEFAULT_MIN_SCORE) -> List[dict]:
+    """
+    Para cada evento de `events`, su casi-duplicado en `reference` (si lo hay):
+    [{"id", "title", "match_id", "match_title", "score"}], de mayor a menor score.
+    """
+    index = DuplicateIndex(reference, events)
+    found = []
+    for e in events:
+        hit = index.best_match(e, min_score)
+        if hit:
+            other, score = hit
+            found.append({"id": e["id"], "title": e.get("title"),
+                          "match_id": other["id"], "match_title": other.get("title"),
+                          "score": score})
+    found.sort(key=lambda m: (-m["score"], m["id"]))
+    return found
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Formato de fechas para mostrar eventos, compartido por el recolector y la app.
+El recolector precalcula con `derive()` los campos de visualización y los guarda
+en events.json; la app solo compara `ts_start`/`ts_end` con un único "ahora".
+"""
+from __future__ import annotations
+from datetime import datetime, date, time
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+TZ = ZoneInfo("Europe/Madrid")
+
+MESES = ["ene","feb","mar","abr","may","jun","jul","ago","sep","oct","nov","dic"]
+DIAS  = ["lun","mar","mié","jue","vie","sáb","dom"]
+
+# Campos que añade derive(); el resto del evento no se toca
+DERIVED_FIELDS = ("ts_start", "ts_end", "date_label", "weekday")
+
+def fmt_fecha_rango(d1: str, d2: str) -> str:
+    y1, m1, d_1 = d1.split("-")
+    y2, m2, d_2 = d2.split("-")
+    m1n, m2n = int(m1), int(m2)
+    if d1 == d2:
+        return f"{int(d_1)} {MESES[m1n-1]} {y1}"
+    if y1 == y2 and m1 == m2:
+        return f"{int(d_1)}–{int(d_2)} {MESES[m1n-1]} {y1}"
+    if y1 == y2:
+        return f"{int(d_1)} {MESES[m1n-1]} – {int(d_2)} {MESES[m2n-1]} {y1}"
+    return f"{int(d_1)} {MESES[m1n-1]} {y1} – {int(d_2)} {MESES[m2n-1]} {y2}"
+
+def parse_dt(s: str) -> datetime:
+    # ISO con TZ, p. ej. 2025-09-20T11:00:00+02:00; sin TZ se asume Europe/Madrid
+    d = datetime.fromisoformat(s.replace("Z","+00:00"))
+    return d if d.tzinfo else d.replace(tzinfo=TZ)
+
+def fmt_horario(d1: datetime, d2: datetime, all_day: bool) -> str:
+    dia = DIAS[d1.weekday()]
+    if all_day:
+        return f"{dia} {d1.day} {MESES[d1.month-1]} {d1.year} · todo el día"
+    if d1.date() == d2.date():
+        return f"{dia} {d1.day} {MESES[d1.month-1]} {d1.year} · {d1.strftime('%H:%M')}–{d2.strftime('%H:%M')}"
+    return f"{dia} {d1.day} {MESES[d1.month-1]} {d1.year} · {d1.strftime('%H:%M')} → {d2.day} {MESES[d2.month-1]} {d2.year} {d2.strftime('%H:%M')}"
+
+def fmt_dias(days: list) -> str:
+    """Días sueltos agrupados por mes: "1, 8 y 15 oct 2025", "30 sep, 7 oct 2025"."""
+    groups = []   # [(año, mes, [días])] en orden
+    for iso in days:
+        y, m, d = (int(x) for x in iso.split("-"))
+        if groups and groups[-1][:2] == (y, m):
+            groups[-1][2].append(d)
+        else:
+            groups.append((y, m, [d]))
+    parts = []
+    for i, (y, m, ds) in enumerate(groups):
+        txt = ", ".join(str(d) for d in ds[:-1]) + " y " + str(ds[-1]) if len(ds) > 1 else str(ds[0])
+        txt += f" {MESES[m-1]}"
+        if i == len(groups) - 1 or groups[i + 1][0] != y:
+            txt += f" {y}"
+        parts.append(txt)
+    return ", ".join(parts)
+
+def _day_bounds(d1: str, d2: str):
+    start = datetime.combine(date.fromisoformat(d1), time.min, tzinfo=TZ)
+    end = datetime.combine(date.fromisoformat(d2), time(23, 59, 59), tzinfo=TZ)
+    return start, end
+
+def derive(e: dict) -> Optional[dict]:
+    """
+    Campos de visualización de un evento:
+    ts_start/ts_end (epoch, s), date_label (línea de fecha) y weekday del inicio.
+    Devuelve None si el evento no tiene fechas válidas (o termina antes de empezar).
+    """
+    try:
+        if e.get("type") == "exhibition" or not e.get("datetime_start"):
+            d1, d2 = e["date_start"], e.get("date_end") or e["date_start"]
+            start, end = _day_bounds(d1, d2)
+            label = fmt_fecha_rango(d1, d2)
+        else:
+            start = parse_dt(e["datetime_start"])
+            end = parse_dt(e.get("datetime_end") or e["datetime_start"])
+            if e.get("occurrences"):
+                # actividad en días sueltos: se listan, no se muestra un rango
+                hours = "todo el día" if e.get("all_day", False) else f"{start:%H:%M}–{end:%H:%M}"
+                label = f"{fmt_dias(e['occurrences'])} · {hours}"
+            else:
+                label = fmt_horario(start, end, e.get("all_day", False))
+    except (KeyError, TypeError, ValueError):
+        return None
+    if end < start:
+        return None
+    return {
+        "ts_start": int(start.timestamp()),
+        "ts_end": int(end.timestamp()),
+        "date_label": label,
+        "weekday": DIAS[start.weekday()],
+    }
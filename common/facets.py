@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""
+Índices de facetas para los filtros de la app (data/facets.json).
+El recolector los genera junto a events.json:
+- conjuntos de documentos por sede y por tipo (se combinan por intersección);
+- inicios y finales ordenados (ts_start / ts_end): "no pasados" y "empieza en
+  los próximos N días" son una búsqueda binaria cada uno.
+El filtro por fechas no va aquí sino en el índice de ocurrencias
+(common/occurrences.py), que se pasa a `select` como `ids`.
+`by_start` sigue además el orden de la lista (ts_start, título): recorrerlo da la
+vista ya ordenada sin ordenar en la app.
+"""
+from __future__ import annotations
+from bisect import bisect_left
+from typing import Iterable, List, Optional, Set
+
+FACETS_VERSION = 1
+
+NEVER = 2 ** 62   # ts_end de eventos sin fecha válida: nunca "pasados"
+
+
+def build(events: Iterable[dict]) -> dict:
+    """Índice serializable a partir de los eventos (con ts_start/ts_end)."""
+    ids: List[str] = []
+    institutions: dict = {}
+    names: dict = {}
+    types: dict = {}
+    starts, ends = [], []
+    for doc, e in enumerate(events):
+        ids.append(e["id"])
+        inst = e.get("institution_id") or ""
+        institutions.setdefault(inst, []).append(doc)
+        names.setdefault(inst, e.get("institution_name") or inst)
+        types.setdefault(e.get("type") or "", []).append(doc)
+        starts.append((e.get("ts_start", 0), e.get("title", ""), doc))
+        ends.append((e.get("ts_end", NEVER), doc))
+    starts.sort()
+    ends.sort()
+    return {
+        "version": FACETS_VERSION,
+        "ids": ids,
+        "institution": institutions,
+        "institution_names": names,
+        "type": types,
+        "by_start": {"ts": [s[0] for s in starts], "docs": [s[2] for s in starts]},
+        "by_end": {"ts": [x[0] for x in ends], "docs": [x[1] for x in ends]},
+    }
+
+
+class FacetIndex:
+    """Índice cargado en memoria (conjuntos ya construidos) para consultar rápido."""
+
+    def __init__(self, data: dict):
+        self.ids: List[str] = data["ids"]
+        self.institution = {k: frozenset(v) for k, v in data["institution"].items()}
+        self.institution_names = data.get("institution_names") or {}
+        self.type = {k: frozenset(v) for k, v in data["type"].items()}
+        self._starts, self._start_docs = data["by_start"]["ts"], data["by_start"]["docs"]
+        self._ends, self._end_docs = data["by_end"]["ts"], data["by_end"]["docs"]
+        self._doc = {i: d for d, i in enumerate(self.ids)}
+
+    def _union(self, facet: dict, keys: Iterable[str]) -> Set[int]:
+        out: Set[int] = set()
+        for k in keys:
+            out |= facet.get(k, frozenset())
+        return out
+
+    def starting_before(self, ts: float) -> List[int]:
+        """Documentos con ts_start < ts."""
+        return self._start_docs[:bisect_left(self._starts, ts)]
+
+    def ending_from(self, ts: float) -> List[int]:
+        """Documentos con ts_end >= ts."""
+        return self._end_docs[bisect_left(self._ends, ts):]
+
+    def select(self, institutions=None, types=None, not_before: Optional[float] = None, start_before: Optional[float] = None,
+               ids: Optional[Iterable[str]] = None) -> List[int]:
+        """
+        Documentos que cumplen todos los filtros dados (None = sin filtrar),
+        en el orden de la vista (ts_start, título).
+        """
+        sets: List[Set[int]] = []
+        if institutions:
+            sets.append(self._union(self.institution, institutions))
+        if types:
+            sets.append(self._union(self.type, types))
+        if not_before is not None:
+            sets.append(set(self.ending_from(not_before)))
+        if start_before is not None:
+            sets.append(set(self.starting_before(start_before)))
+        if ids is not None:
+            sets.append({self._doc[i] for i in ids if i in self._doc})
+        if not sets:
+            return list(self._start_docs)
+        sets.sort(key=len)
+        docs = set(sets[0]).intersection(*sets[1:])
+        return [d for d in self._start_docs if d in docs] if docs else []
+
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Feeds iCalendar (data/feeds/*.ics) para suscribirse desde cualquier calendario:
+todos los eventos (all.ics), por sede (institution-<id>.ics) y por tipo
+(type-<tipo>.ics).
+- Escritura en streaming (línea a línea a un temporal y os.replace), con el
+  plegado a 75 octetos y el escapado de RFC 5545.
+- UID estable: el `id` (SHA1) del evento.
+- Incremental: cada feed guarda en data/feeds/index.json el hash de sus miembros
+  (id + content_hash); si no cambia, el fichero no se toca. Junto a cada feed va
+  `<feed>.ics.etag` con el hash de su contenido para revalidar sin descargarlo.
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List
+
+from common.display import parse_dt
+
+FEEDS_VERSION = 1
+PRODID = "-//Agenda cultural Malaga//ES"
+CAL_NAME = "Agenda cultural · Málaga"
+TYPE_NAMES = {"exhibition": "Exposiciones", "activity": "Actividades"}
+
+
+# --- Formato RFC 5545 ---------------------------------------------------------
+def _escape(s: str) -> str:
+    return (s.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+             .replace("\r\n", "\\n").replace("\n", "\\n"))
+
+
+def _fold(line: str) -> bytes:
+    """Líneas de 75 octetos como máximo; las continuaciones empiezan por espacio."""
+    raw = line.encode("utf-8")
+    if len(raw) <= 75:
+        return raw + b"\r\n"
+    out, chunk, limit = [], b"", 75
+    for ch in line:
+        b = ch.encode("utf-8")
+        if len(chunk) + len(b) > limit:
+            out.append(chunk)
+            chunk, limit = b" ", 75
+        chunk += b
+    out.append(chunk)
+    return b"\r\n".join(out) + b"\r\n"
+
+
+def _utc(s: str) -> str:
+    return parse_dt(s).astimezone(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+
+def _day(iso: str, plus: int = 0) -> str:
+    return (date.fromisoformat(iso[:10]) + timedelta(days=plus)).strftime("%Y%m%d")
+
+
+def vevent(e: dict, stamp: str) -> List[str]:
+    """
+    Líneas (sin plegar) del VEVENT de un evento. Lista vacía si termina antes de
+    empezar (RFC 5545 no admite DTEND anterior a DTSTART).
+    """
+    lines = ["BEGIN:VEVENT", f"UID:{e['id']}@malaga-cultura", f"DTSTAMP:{stamp}"]
+    occ = e.get("occurrences") or []
+    if e.get("type") == "exhibition" or not e.get("datetime_start") or e.get("all_day"):
+        # días completos: DTEND es exclusivo
+        start = e.get("date_start") or e["datetime_start"]
+        end = e.get("date_end") or e.get("datetime_end") or start
+        dtstart, dtend = _day(start), _day(occ[0] if occ else end, 1)
+        if dtend <= dtstart:
+            return []
+        lines.append(f"DTSTART;VALUE=DATE:{dtstart}")
+        lines.append(f"DTEND;VALUE=DATE:{dtend}")
+        if len(occ) > 1:
+            lines.append("RDATE;VALUE=DATE:" + ",".join(_day(d) for d in occ[1:]))
+    else:
+        start, end = e["datetime_start"], e.get("datetime_end") or e["datetime_start"]
+        if occ:
+            # misma hora en cada día suelto
+            start, end = occ[0] + start[10:], occ[0] + end[10:]
+            if len(occ) > 1:
+                lines.append("RDATE:" + ",".join(_utc(d + start[10:]) for d in occ[1:]))
+        dtstart, dtend = _utc(start), _utc(end)
+        if dtend < dtstart:      # YYYYMMDDTHHMMSSZ: el orden de texto es el temporal
+            return []
+        lines[3:3] = [f"DTSTART:{dtstart}", f"DTEND:{dtend}"]
+    lines.append(f"SUMMARY:{_escape(e.get('title') or '')}")
+    if e.get("description"):
+        lines.append(f"DESCRIPTION:{_escape(e['description'])}")
+    place = ", ".join(x for x in (e.get("institution_name"), e.get("city")) if x)
+    if place:
+        lines.append(f"LOCATION:{_escape(place)}")
+    if e.get("url"):
+        lines.append(f"URL:{e['url']}")
+    if e.get("type"):
+        lines.append(f"CATEGORIES:{_escape(TYPE_NAMES.get(e['type'], e['type']))}")
+    lines.append("END:VEVENT")
+    return lines
+
+
+def write_feed(path: str, name: str, events: Iterable[dict], stamp: str) -> str:
+    """Escribe el feed en streaming y devuelve el SHA1 de su contenido."""
+    h = hashlib.sha1()
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        def put(line: str):
+            data = _fold(line)
+            h.update(data)
+            f.write(data)
+        for line in ("BEGIN:VCALENDAR", "VERSION:2.0", f"PRODID:{PRODID}", "CALSCALE:GREGORIAN",
+                     "METHOD:PUBLISH", f"X-WR-CALNAME:{_escape(name)}", "X-WR-TIMEZONE:Europe/Madrid"):
+            put(line)
+        for e in events:
+            for line in vevent(e, stamp):
+                put(line)
+        put("END:VCALENDAR")
+    os.replace(tmp, path)
+    return h.hexdigest()
+
+
+# --- Feeds incrementales ------------------------------------------------------
+def feed_members(events: List[dict]) -> Dict[str, dict]:
+    """{fichero: {"name", "events"}}: todos, por sede y por tipo."""
+    feeds: Dict[str, dict] = {"all.ics": {"name": CAL_NAME, "events": []}}
+    for e in events:
+        feeds["all.ics"]["events"].append(e)
+        inst = e.get("institution_id")
+        if inst:
+            feeds.setdefault(f"institution-{inst}.ics", {
+                "name": f"{CAL_NAME} · {e.get('institution_name') or inst}", "events": []})["events"].append(e)
+        kind = e.get("type")
+        if kind:
+            feeds.setdefault(f"type-{kind}.ics", {
+                "name": f"{CAL_NAME} · {TYPE_NAMES.get(kind, kind)}", "events": []})["events"].append(e)
+    return feeds
+
+
+def members_hash(events: List[dict]) -> str:
+    h = hashlib.sha1(f"v{FEEDS_VERSION}".encode())
+    for e in sorted(events, key=lambda x: x["id"]):
+        h.update(f"{e['id']}:{e.get('content_hash', '')}\n".encode())
+    return h.hexdigest()
+
+
+def write_all(out_dir: str, events: List[dict]) -> Dict[str, int]:
+    """
+    Regenera solo los feeds cuyos miembros cambiaron (o cuyo fichero falta) y
+    borra los que ya no tienen eventos. Devuelve {"written", "kept", "removed"}.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    index_path = os.path.join(out_dir, "index.json")
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except Exception:
+        index = {}
+
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    stats = {"written": 0, "kept": 0, "removed": 0}
+    new_index = {}
+    for fname, feed in feed_members(events).items():
+        path = os.path.join(out_dir, fname)
+        digest = members_hash(feed["events"])
+        prev = index.get(fname) or {}
+        if prev.get("members") == digest and os.path.exists(path) and os.path.exists(path + ".etag"):
+            new_index[fname] = prev
+            stats["kept"] += 1
+            continue
+        etag = write_feed(path, feed["name"], feed["events"], stamp)
+        with open(path + ".etag", "w", encoding="utf-8") as f:
+            f.write(f'"{etag}"\n')
+        new_index[fname] = {"members": digest, "etag": etag, "events": len(feed["events"]),
+                            "updated_at": datetime.now(timezone.utc).isoformat()}
+        stats["written"] += 1
+
+    for fname in index:
+        if fname not in new_index:
+            for p in (fname, fname + ".etag"):
+                try:
+                    os.remove(os.path.join(out_dir, p))
+                except FileNotFoundError:
+                    pass
+            stats["removed"] += 1
+
+    if new_index != index:
+        with open(index_path, "w", encoding="utf-8") as f:
+            json.dump(new_index, f, ensure_ascii=False, indent=2)
+    return stats
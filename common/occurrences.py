@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de ocurrencias por día (data/occurrences.json): "qué hay el día X" o "en
+la semana W" es una consulta directa, sin recorrer los eventos.
+- days: {"YYYY-MM-DD": [ids]} con los días sueltos (`occurrences`) y los eventos
+  cortos (menos de SHORT_SPAN días) ya expandidos;
+- spans: los eventos largos (exposiciones de meses o años) como intervalos
+  [inicio, fin] ordenados por inicio; no se expanden día a día, así que el
+  índice no crece con la duración.
+Al cargar, los intervalos largos se reparten en cubetas por mes ("YYYY-MM"): una
+consulta solo mira los de sus meses, no todo el histórico. La app guarda en
+caché el resultado de cada consulta.
+"""
+from __future__ import annotations
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple, Union
+
+INDEX_VERSION = 2
+SHORT_SPAN = 14   # días; a partir de aquí el evento va a `spans`
+
+Day = Union[date, str]
+
+
+def _iso(d: Day) -> str:
+    return d if isinstance(d, str) else d.isoformat()
+
+
+def event_days(e: dict) -> Optional[Tuple[date, date]]:
+    """
+    Primer y último día del evento según su fecha publicada (como los eventos de
+    día completo de feeds.py), o None sin fechas. No sale de ts_start: las
+    actividades llevan un desfase fijo (+02:00) que en invierno no es el de Madrid.
+    """
+    start = e.get("date_start") or (e.get("datetime_start") or "")[:10]
+    if not start:
+        return None
+    end = e.get("date_end") or (e.get("datetime_end") or "")[:10] or start
+    try:
+        return date.fromisoformat(start), date.fromisoformat(end)
+    except ValueError:
+        return None
+
+
+def build(events: Iterable[dict]) -> dict:
+    days: Dict[str, List[str]] = {}
+    spans: List[Tuple[str, str, str]] = []
+    for e in events:
+        if e.get("occurrences"):
+            for d in e["occurrences"]:
+                days.setdefault(d, []).append(e["id"])
+            continue
+        bounds = event_days(e)
+        if not bounds:
+            continue
+        d1, d2 = bounds
+        n = (d2 - d1).days
+        if n < SHORT_SPAN:
+            for i in range(max(0, n) + 1):
+                days.setdefault((d1 + timedelta(days=i)).isoformat(), []).append(e["id"])
+        else:
+            spans.append((d1.isoformat(), d2.isoformat(), e["id"]))
+    spans.sort()
+    return {
+        "version": INDEX_VERSION,
+        "days": dict(sorted(days.items())),
+        "spans": {"start": [s[0] for s in spans], "end": [s[1] for s in spans],
+                  "ids": [s[2] for s in spans]},
+    }
+
+
+class OccurrenceIndex:
+    def __init__(self, data: dict):
+        self._days: Dict[str, List[str]] = data["days"]
+        sp = data["spans"]
+        self._starts, self._ends, self._span_ids = sp["start"], sp["end"], sp["ids"]
+        self._months: Dict[str, List[int]] = {}   # "YYYY-MM" -> intervalos que lo tocan
+        for i, (d1, d2) in enumerate(zip(self._starts, self._ends)):
+            for month in _months(d1, d2):
+                self._months.setdefault(month, []).append(i)
+
+    def _spans(self, d1: str, d2: str) -> Set[str]:
+        """Eventos largos que solapan con [d1, d2] (fechas ISO: se comparan como texto)."""
+        out: Set[str] = set()
+        for month in _months(d1, d2):
+            for i in self._months.get(month, ()):
+                if self._starts[i] <= d2 and self._ends[i] >= d1:
+                    out.add(self._span_ids[i])
+        return out
+
+    def between(self, d1: Day, d2: Day) -> Set[str]:
+        """Ids de los eventos con alguna ocurrencia entre `d1` y `d2` (incluidos)."""
+        a, b = date.fromisoformat(_iso(d1)), date.fromisoformat(_iso(d2))
+        out = self._spans(a.isoformat(), b.isoformat())
+        for i in range((b - a).days + 1):
+            out.update(self._days.get((a + timedelta(days=i)).isoformat(), ()))
+        return out
+
+
+def _months(d1: str, d2: str) -> Iterable[str]:
+    """Meses ("YYYY-MM") de d1 a d2, ambos incluidos."""
+    y, m = int(d1[:4]), int(d1[5:7])
+    last = d2[:7]
+    while True:
+        month = f"{y:04d}-{m:02d}"
+        if month > last:
+            return
+        yield month
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+
+
+# --- Rangos de los filtros ----------------------------------------------------
+def week_of(day: date) -> Tuple[date, date]:
+    monday = day - timedelta(days=day.weekday())
+    return monday, monday + timedelta(days=6)
+
+
+def weekend_of(day: date) -> Tuple[date, date]:
+    """Sábado y domingo de la semana de `day` (el fin de semana en curso si ya lo es)."""
+    saturday = week_of(day)[0] + timedelta(days=5)
+    return saturday, saturday + timedelta(days=1)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Índice invertido para la búsqueda de la app (data/search_index.json).
+El recolector lo construye una vez sobre título, descripción y sede; la app lo
+carga cacheado y cada búsqueda es una consulta al índice:
+- sin tildes ni mayúsculas ("málaga" == "MALAGA");
+- por prefijo ("pica" encuentra "Picasso"), con búsqueda binaria sobre los
+  términos ordenados;
+- varias palabras se combinan con AND.
+"""
+from __future__ import annotations
+import re
+import unicodedata
+from bisect import bisect_left
+from typing import Dict, Iterable, List, Optional, Set
+
+INDEX_VERSION = 1
+FIELDS = ("title", "description", "institution_name")
+MIN_TOKEN = 2
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def fold(s: str) -> str:
+    """
+    Minúsculas sin diacríticos (como scrapers.dates.norm). Solo se buscan
+    palabras [a-z0-9], así que tras NFKD basta con quedarse con el ASCII.
+    """
+    if not s.isascii():
+        s = unicodedata.normalize("NFKD", s).encode("ascii", "ignore").decode("ascii")
+    return s.lower()
+
+
+def tokens(text: str) -> List[str]:
+    return [t for t in _WORD.findall(fold(text)) if len(t) >= MIN_TOKEN]
+
+
+def build(events: Iterable[dict]) -> dict:
+    """Índice serializable: términos ordenados y, para cada uno, sus documentos."""
+    ids: List[str] = []
+    postings: Dict[str, Set[int]] = {}
+    for doc, e in enumerate(events):
+        ids.append(e["id"])
+        for field in FIELDS:
+            for tok in tokens(e.get(field) or ""):
+                postings.setdefault(tok, set()).add(doc)
+    terms = sorted(postings)
+    return {
+        "version": INDEX_VERSION,
+        "ids": ids,
+        "terms": terms,
+        "postings": [sorted(postings[t]) for t in terms],
+    }
+
+
+def _prefix_docs(index: dict, prefix: str) -> Set[int]:
+    terms = index["terms"]
+    docs: Set[int] = set()
+    i = bisect_left(terms, prefix)
+    while i < len(terms) and terms[i].startswith(prefix):
+        docs.update(index["postings"][i])
+        i += 1
+    return docs
+
+
+def search(index: dict, query: str) -> Optional[Set[str]]:
+    """Ids que casan con todas las palabras de `query`; None si no hay consulta."""
+    words = _WORD.findall(fold(query or ""))
+    if not words:
+        return None
+    docs: Optional[Set[int]] = None
+    for w in sorted(set(words), key=len, reverse=True):   # las más selectivas primero
+        found = _prefix_docs(index, w)
+        docs = found if docs is None else docs & found
+        if not docs:
+            return set()
+    ids = index["ids"]
+    return {ids[d] for d in docs}
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Almacén SQLite de eventos (data/events.sqlite), escrito por el recolector junto a
+events.json. Guarda también el histórico: los eventos que dejan de aparecer se
+conservan con `active = 0` y su último `last_seen_at`, durante `history_days`
+días; después se borran (el fichero se sube al repo y no debe crecer sin fin).
+
+La app lo consulta por ventanas (próximos N días, facetas, paginación con
+LIMIT/OFFSET) sin cargar todo el fichero en memoria.
+"""
+from __future__ import annotations
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Tuple
+
+DEFAULT_HISTORY_DAYS = 365
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    id             TEXT PRIMARY KEY,
+    type           TEXT,
+    institution_id TEXT,
+    ts_start       INTEGER,
+    ts_end         INTEGER,
+    title          TEXT,
+    last_seen_at   TEXT,
+    active         INTEGER NOT NULL DEFAULT 1,
+    data           TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_start ON events (ts_start);
+CREATE INDEX IF NOT EXISTS idx_events_end ON events (ts_end);
+CREATE INDEX IF NOT EXISTS idx_events_institution ON events (institution_id, ts_start);
+CREATE INDEX IF NOT EXISTS idx_events_type ON events (type, ts_start);
+CREATE INDEX IF NOT EXISTS idx_events_active_end ON events (active, ts_end);
+"""
+
+_UPSERT = """
+INSERT INTO events (id, type, institution_id, ts_start, ts_end, title, last_seen_at, active, data)
+VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?)
+ON CONFLICT(id) DO UPDATE SET
+    type = excluded.type, institution_id = excluded.institution_id,
+    ts_start = excluded.ts_start, ts_end = excluded.ts_end, title = excluded.title,
+    last_seen_at = excluded.last_seen_at, active = 1, data = excluded.data
+"""
+
+
+def write(path: str, events: list, history_days: float = DEFAULT_HISTORY_DAYS) -> None:
+    """
+    Inserta/actualiza `events`, marca como inactivos los que ya no están y borra
+    los inactivos no vistos en `history_days` días.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=history_days)).isoformat()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(SCHEMA)
+        with conn:
+            conn.execute("CREATE TEMP TABLE current_ids (id TEXT PRIMARY KEY)")
+            conn.executemany(_UPSERT, [
+                (e["id"], e.get("type"), e.get("institution_id"), e.get("ts_start"), e.get("ts_end"),
+                 e.get("title"), e.get("last_seen_at"), json.dumps(e, ensure_ascii=False))
+                for e in events
+            ])
+            conn.executemany("INSERT OR IGNORE INTO current_ids VALUES (?)", [(e["id"],) for e in events])
+            conn.execute("UPDATE events SET active = 0 WHERE active = 1 AND id NOT IN (SELECT id FROM current_ids)")
+            purged = conn.execute("DELETE FROM events WHERE active = 0 AND "
+                                  "(last_seen_at IS NULL OR last_seen_at < ?)", (cutoff,)).rowcount
+        if purged:
+            conn.execute("VACUUM")   # devuelve el espacio solo si se ha borrado algo
+    finally:
+        conn.close()
+
+
+def connect(path: str) -> Optional[sqlite3.Connection]:
+    """Conexión de solo lectura (None si el almacén no existe)."""
+    if not os.path.exists(path):
+        return None
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+
+def _window(now_ts: int, show_past: bool, days: Optional[int],
+            ids: Optional[Iterable[str]] = None, institutions: Iterable[str] = (),
+            types: Iterable[str] = ()) -> Tuple[str, list]:
+    # Visibles: activos y no terminados; con pasados, también el histórico ya terminado
+    if show_past:
+        where, args = "(active = 1 OR ts_end < ?)", [now_ts]
+    else:
+        where, args = "active = 1 AND ts_end >= ?", [now_ts]
+    if days:
+        where += " AND ts_start < ?"
+        args.append(now_ts + days * 86400)
+    # facetas: usan los índices (institution_id, ts_start) y (type, ts_start)
+    institutions, types = list(institutions or ()), list(types or ())
+    if institutions:
+        where += f" AND institution_id IN ({','.join('?' * len(institutions))})"
+        args += institutions
+    if types:
+        where += f" AND type IN ({','.join('?' * len(types))})"
+        args += types
+    if ids is not None:
+        # resultado de la búsqueda: un único parámetro aunque sean miles de ids
+        where += " AND id IN (SELECT value FROM json_each(?))"
+        args.append(json.dumps(sorted(ids)))
+    return where, args
+
+
+def count(conn: sqlite3.Connection, now_ts: int, show_past: bool = False, days: Optional[int] = None,
+          ids: Optional[Iterable[str]] = None, **filters) -> int:
+    where, args = _window(now_ts, show_past, days, ids, **filters)
+    return conn.execute(f"SELECT COUNT(*) FROM events WHERE {where}", args).fetchone()[0]
+
+
+def upcoming(conn: sqlite3.Connection, now_ts: int, show_past: bool = False, days: Optional[int] = None,
+             limit: int = 20, offset: int = 0, ids: Optional[Iterable[str]] = None,
+             **filters) -> List[dict]:
+    """
+    Eventos visibles ahora (o que empiezan en los próximos `days` días), paginados.
+    Con `ids` solo se devuelven esos (resultado de una búsqueda o del índice de
+    ocurrencias); `filters` son las facetas: institutions y types.
+    """
+    where, args = _window(now_ts, show_past, days, ids, **filters)
+    rows = conn.execute(
+        f"SELECT data FROM events WHERE {where} ORDER BY ts_start, title LIMIT ? OFFSET ?",
+        args + [limit, offset])
+    return [json.loads(r[0]) for r in rows]
+
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Listados paginados, recorridos de forma incremental.
+- Las páginas se piden por tandas de `workers` en paralelo (el límite y el ritmo
+  por host los sigue aplicando scrapers.http) y se evalúan en orden.
+- Marca de agua: los eventos del último recorrido (por `id`, el SHA1 de su clave)
+  se guardan en la caché de scrapers.http. En cuanto una página trae solo eventos
+  conocidos y sin cambios, el recorrido para y los eventos de las páginas que no
+  se han leído se arrastran tal cual desde la marca. Un recorrido diario cuesta
+  así una tanda de peticiones (casi siempre 304) y no el archivo entero.
+- El listado termina en la primera página vacía, que falla (404) o que repite
+  eventos ya vistos en este recorrido; o al llegar a `max_pages`. Un 404 antes
+  de la última página del recorrido completo anterior no se toma como final sino
+  como fallo (se arrastra lo que falta), salvo en un recorrido completo. En
+  replay, igual: el 404 es una página sin instantánea.
+- Se arrastran solo los eventos que en la marca iban detrás del último conocido
+  que se ha vuelto a leer: los anteriores que ya no aparecen se dan por retirados.
+- Cada `full_every_days` días se hace un recorrido completo, sin marca, para que
+  desaparezcan los eventos retirados de páginas antiguas.
+- En modo replay (collect.py --reparse) la marca se lee pero no se actualiza.
+"""
+from __future__ import annotations
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from scrapers import http
+
+DEFAULT_MAX_PAGES = 10
+DEFAULT_WORKERS = 2
+DEFAULT_FULL_EVERY_DAYS = 7
+
+
+def _fingerprint(e: dict) -> str:
+    return hashlib.sha1(json.dumps(e, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _mark_url(name: str) -> str:
+    # la marca vive en la caché HTTP como una entrada más (--no-cache la ignora)
+    return f"crawl:{name}"
+
+
+def page_urls(first_url: str, template: Optional[str], first: int, max_pages: int) -> List[str]:
+    """URLs del listado: la primera página y, si hay plantilla, las siguientes."""
+    urls = [first_url]
+    if template:
+        urls += [template.format(n=n) for n in range(first, first + max_pages - 1)]
+    return urls
+
+
+def crawl(name: str, urls: List[str], parse: Callable[[str, str], List[dict]], key: str,
+          headers: Optional[dict] = None, workers: int = DEFAULT_WORKERS,
+          full_every_days: float = DEFAULT_FULL_EVERY_DAYS) -> List[dict]:
+    """
+    Recorre `urls` en orden con `parse(html, url)` y devuelve los eventos del
+    listado completo. `name` identifica el listado y `key` el parser (con su
+    versión): si cambia, la marca anterior no sirve. Si falla la primera
+    página se propaga la excepción.
+    """
+    mark = http.load_entry(_mark_url(name))
+    known: Dict[str, str] = {}
+    if mark.get("key") == key:
+        known = {e["id"]: _fingerprint(e) for e in mark.get("events") or [] if e.get("id")}
+    full_at = mark.get("full_at") or ""
+    use_mark = bool(known) and bool(full_at) and (
+        datetime.now(timezone.utc) - datetime.fromisoformat(full_at)).total_seconds() < full_every_days * 86400
+
+    def fetch(url: str) -> List[dict]:
+        return http.fetch_parsed(url, lambda html: parse(html, url), key=key, headers=headers)
+
+    events: List[dict] = []
+    seen = set()
+    pages = 0
+    how = "complete"      # complete | early stop | incomplete
+
+    def take(page: List[dict]) -> bool:
+        """Añade los eventos de la página; True si el recorrido termina en ella."""
+        nonlocal how, pages
+        if not page or all(e.get("id") in seen for e in page):
+            return True   # página vacía o repetida: fin del listado
+        pages += 1
+        for e in page:
+            if e.get("id") not in seen:
+                seen.add(e.get("id"))
+                events.append(e)
+        if use_mark and all(known.get(e.get("id")) == _fingerprint(e) for e in page):
+            how = "early stop"
+            return True
+        return False
+
+    workers = max(1, workers)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="crawl") as pool:
+        done = False
+        for start in range(0, len(urls), workers):
+            futures = [pool.submit(copy_context().run, fetch, u) for u in urls[start:start + workers]]
+            for n, fut in enumerate(futures, start):
+                try:
+                    page = fut.result()
+                except Exception as ex:
+                    if n == 0:
+                        raise
+                    # 404 tras la última página: fin; otro error o un 404 antes de
+                    # donde llegó el último recorrido completo: recorrido incompleto.
+                    # En replay un 404 es una página sin instantánea (solo se
+                    # guardan las 200): se juzga igual, por las páginas de la marca.
+                    if getattr(getattr(ex, "response", None), "status_code", None) != 404:
+                        print(f"[WARN] {name} page {urls[n]} failed: {ex}")
+                        how = "incomplete"
+                    elif (use_mark or http.replaying()) and n < mark.get("pages", 0):
+                        print(f"[WARN] {name} page {urls[n]} not found (listing had {mark['pages']} pages)")
+                        how = "incomplete"
+                    done = True
+                    break
+                if take(page):
+                    done = True
+                    break
+            if done:
+                break
+
+    carried = 0
+    if how != "complete" and mark.get("key") == key:
+        # Lo no leído sale de la marca: los eventos que iban detrás del último
+        # conocido que hemos vuelto a ver (los de antes que no han aparecido ya
+        # no están en el listado).
+        previous = mark.get("events") or []
+        last = max((k for k, e in enumerate(previous) if e.get("id") in seen), default=-1)
+        for e in previous[last + 1:]:
+            if e.get("id") not in seen:
+                events.append(e)
+                carried += 1
+
+    if not http.replaying():
+        http.save_entry(_mark_url(name), {
+            "url": _mark_url(name),
+            "key": key,
+            "full_at": datetime.now(timezone.utc).isoformat() if how == "complete" else full_at,
+            # páginas con eventos del último recorrido completo
+            "pages": pages if how == "complete" else mark.get("pages", pages),
+            "events": events,
+        })
+    print(f"[OK] {name} -> {pages} pages ({how}), {len(events) - carried} read, {carried} carried")
+    return events
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Gramática de fechas en español para los scrapers.
+- `norm()`: minúsculas, sin tildes, guiones y espacios normalizados.
+- `parse_date_range()`: una sola expresión compilada con todas las formas que
+  publican las sedes; el resultado se memoiza por texto normalizado.
+- `parse_dates()`: lo mismo y, si el texto enumera días sueltos, la lista de
+  fechas concretas (una actividad el 1, 8 y 15 no ocurre todos los días).
+- `key_dates()`: las fechas que daba la primera versión, solo para la clave de
+  los ids (que no cambien al corregir la gramática).
+
+Formas reconocidas (en orden de prioridad si empiezan en la misma posición):
+    19 septiembre 2025-11 enero 2026      dd mes yyyy - dd mes yyyy
+    3-5 diciembre 2025                    dd - dd mes yyyy
+    del 2 al 30 de noviembre de 2025      del dd al dd mes yyyy
+    septiembre-diciembre 2025             mes - mes yyyy (día 1 .. último día del mes)
+    septiembre-enero 2026                 mes - mes yyyy cruzando el año (sep 2025 .. ene 2026)
+    1, 8, 15, 22 y 29 octubre 2025        lista de días (mín..máx + días concretos)
+    5 y 12-14 octubre 2025                lista con tramos (5, 12, 13 y 14)
+    14 noviembre 2025                     día único
+El "de" entre día, mes y año es opcional ("1 de octubre de 2025").
+"""
+from __future__ import annotations
+import re
+import unicodedata
+from calendar import monthrange
+from functools import lru_cache
+from typing import Optional, Tuple
+
+MONTHS = {
+    'enero':1,'febrero':2,'marzo':3,'abril':4,'mayo':5,'junio':6,
+    'julio':7,'agosto':8,'septiembre':9,'setiembre':9,'octubre':10,'noviembre':11,'diciembre':12
+}
+
+_M = "|".join(sorted(MONTHS, key=len, reverse=True))
+
+# Cualquier mención de mes (sobre texto sin normalizar)
+MONTH_RE = re.compile(rf"({_M})", re.I)
+
+_DE = r"\s+(?:de\s+)?"              # "1 de octubre de 2025"
+_ITEM = r"\d{1,2}(?:-\d{1,2})?"     # día o tramo de días de una lista
+
+DATE_RE = re.compile(rf"""
+    (?P<r_d1>\d{{1,2}}){_DE}(?P<r_m1>{_M}){_DE}(?P<r_y1>\d{{4}})
+        -(?P<r_d2>\d{{1,2}}){_DE}(?P<r_m2>{_M}){_DE}(?P<r_y2>\d{{4}})
+  | (?P<dd_d1>\d{{1,2}})-(?P<dd_d2>\d{{1,2}}){_DE}(?P<dd_m>{_M}){_DE}(?P<dd_y>\d{{4}})
+  | (?:del\s+)?(?P<al_d1>\d{{1,2}})\s+al\s+(?P<al_d2>\d{{1,2}}){_DE}(?P<al_m>{_M}){_DE}(?P<al_y>\d{{4}})
+  | (?P<mm_m1>{_M})-(?P<mm_m2>{_M}){_DE}(?P<mm_y>\d{{4}})
+  | (?P<l_days>{_ITEM}(?:\s*,\s*{_ITEM})*(?:\s*y\s*{_ITEM})?){_DE}(?P<l_m>{_M}){_DE}(?P<l_y>\d{{4}})
+""", re.X)
+
+_DAY_SPLIT = re.compile(r"[,\sy]+")
+_DASHES = re.compile(r"[–—]+")
+_MULTI_DASH = re.compile(r"-{2,}")
+_DASH_SPACES = re.compile(r"\s*-\s*")
+_SPACES = re.compile(r"\s+")
+_CHAR_MAP = str.maketrans({"\xa0": " ", "�": "-"})
+
+DateRange = Tuple[str, str, str]
+# (date_start, date_end, resto, días concretos o None si es un rango continuo)
+DateSpec = Tuple[str, str, str, Optional[Tuple[str, ...]]]
+
+
+@lru_cache(maxsize=4096)
+def norm(s: str) -> str:
+    """Minúsculas sin diacríticos, con guiones y espacios normalizados."""
+    s = unicodedata.normalize("NFKD", s)
+    if not s.isascii():
+        s = "".join(c for c in s if not unicodedata.combining(c))
+    s = s.translate(_CHAR_MAP)
+    s = _DASHES.sub("-", s)        # guiones largos -> '-'
+    s = _MULTI_DASH.sub("-", s)    # '——' -> '-'
+    s = _DASH_SPACES.sub("-", s)   # espacios alrededor del guion
+    s = _SPACES.sub(" ", s).strip()
+    return s.lower()
+
+
+def has_month(text: str) -> bool:
+    return MONTH_RE.search(text) is not None
+
+
+def _ymd(y: str, mon: str, d) -> str:
+    return f"{y}-{MONTHS[mon]:02d}-{int(d):02d}"
+
+
+def parse_date_range(text: str) -> Optional[DateRange]:
+    """Devuelve (date_start, date_end, remainder_text) en YYYY-MM-DD, o None."""
+    spec = parse_normalized(norm(text))
+    return spec[:3] if spec else None
+
+
+def parse_dates(text: str) -> Optional[DateSpec]:
+    """Como `parse_date_range` más los días concretos (None si es un rango continuo)."""
+    return parse_normalized(norm(text))
+
+
+@lru_cache(maxsize=4096)
+def parse_normalized(t: str) -> Optional[DateSpec]:
+    """Como `parse_dates` pero sobre texto ya pasado por `norm()`."""
+    for m in DATE_RE.finditer(t):
+        g = m.groupdict()
+        rest = t[m.end():].strip()
+        if g["r_d1"]:
+            return _ymd(g["r_y1"], g["r_m1"], g["r_d1"]), _ymd(g["r_y2"], g["r_m2"], g["r_d2"]), rest, None
+        if g["dd_d1"]:
+            y, mon = g["dd_y"], g["dd_m"]
+            return _ymd(y, mon, g["dd_d1"]), _ymd(y, mon, g["dd_d2"]), rest, None
+        if g["al_d1"]:
+            y, mon = g["al_y"], g["al_m"]
+            return _ymd(y, mon, g["al_d1"]), _ymd(y, mon, g["al_d2"]), rest, None
+        if g["mm_m1"]:
+            y = g["mm_y"]
+            # "septiembre-enero 2025": el año es el del mes final; el inicio, el anterior
+            y1 = str(int(y) - 1) if MONTHS[g["mm_m2"]] < MONTHS[g["mm_m1"]] else y
+            last = monthrange(int(y), MONTHS[g["mm_m2"]])[1]
+            return _ymd(y1, g["mm_m1"], 1), _ymd(y, g["mm_m2"], last), rest, None
+        days = set()
+        for item in _DAY_SPLIT.split(g["l_days"]):
+            if "-" in item:                      # tramo "12-14"
+                a, b = item.split("-")
+                days.update(range(int(a), int(b) + 1))
+            elif item.isdigit():
+                days.add(int(item))
+        days = sorted(days)
+        if days:
+            y, mon = g["l_y"], g["l_m"]
+            listed = tuple(_ymd(y, mon, d) for d in days) if len(days) > 1 else None
+            return _ymd(y, mon, days[0]), _ymd(y, mon, days[-1]), rest, listed
+    return None
+
+
+# --- Fechas de la clave de los ids (gramática v1) ----------------------------
+# Los ids de las actividades son el SHA1 de su URL y sus fechas, y los overrides
+# de data/manual_events.json se apoyan en ellos. Para que las correcciones de la
+# gramática no cambien ids, la clave usa las fechas que daba la primera versión
+# (cada forma buscada en todo el texto y por orden; "mes-mes" del 1 al 28 y sin
+# cruzar el año). No tocar: cambiarla cambia los ids.
+_V1_RE = [
+    re.compile(rf"(\d{{1,2}})\s+({_M})\s+(\d{{4}})-(\d{{1,2}})\s+({_M})\s+(\d{{4}})"),
+    re.compile(rf"(\d{{1,2}})-(\d{{1,2}})\s+({_M})\s+(\d{{4}})"),
+    re.compile(rf"({_M})-({_M})\s+(\d{{4}})"),
+    re.compile(rf"(\d{{1,2}}(?:\s*,\s*\d{{1,2}})*(?:\s*y\s*\d{{1,2}})?)\s+({_M})\s+(\d{{4}})"),
+]
+
+
+@lru_cache(maxsize=4096)
+def key_dates(text: str) -> Optional[Tuple[str, str]]:
+    """(inicio, fin) para la clave del id según la gramática v1, o None si no la reconocía."""
+    t = norm(text)
+    m = _V1_RE[0].search(t)
+    if m:
+        d1, m1, y1, d2, m2, y2 = m.groups()
+        return _ymd(y1, m1, d1), _ymd(y2, m2, d2)
+    m = _V1_RE[1].search(t)
+    if m:
+        d1, d2, mon, y = m.groups()
+        return _ymd(y, mon, d1), _ymd(y, mon, d2)
+    m = _V1_RE[2].search(t)
+    if m:
+        m1, m2, y = m.groups()
+        return _ymd(y, m1, 1), _ymd(y, m2, 28)
+    m = _V1_RE[3].search(t)
+    if m:
+        days = [int(x) for x in _DAY_SPLIT.split(m.group(1)) if x.isdigit()]
+        if days:
+            return _ymd(m.group(3), m.group(2), min(days)), _ymd(m.group(3), m.group(2), max(days))
+    return None
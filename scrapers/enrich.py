@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Enriquecimiento de eventos con su ficha de detalle (`url`).
+- Cada scraper que quiera participar expone `parse_detail(html, base)` y
+  `DETAIL_VERSION`; devuelve {"description", "image_url", "times"}.
+- Las fichas se descargan en un pool acotado; el límite por host y el ritmo por
+  host los aplica scrapers.http.
+- Todo pasa por la caché de scrapers.http (URL + hash del cuerpo): una ficha que
+  no cambia no se re-parsea, y dentro de `max_age` ni siquiera se pide.
+- La etapa tiene un presupuesto total: lo que no quepa se queda como estaba.
+  Si una ficha falla o no cabe en el plazo se usa lo extraído de ella la última
+  vez (caché), así el evento no pierde descripción, horas ni imagen.
+"""
+from __future__ import annotations
+import importlib
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import date, datetime, time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin
+
+from common.display import TZ
+from scrapers import http
+
+DEFAULT_WORKERS = 4
+DEFAULT_BUDGET = 90             # segundos para toda la etapa
+DEFAULT_MAX_AGE_DAYS = 7
+
+
+def _local_iso(day: str, hhmm: str) -> str:
+    h, m = (int(x) for x in hhmm.split(":"))
+    return datetime.combine(date.fromisoformat(day), time(h, m), tzinfo=TZ).isoformat()
+
+
+def apply_detail(e: dict, detail: Dict[str, Any]) -> dict:
+    """
+    Aplica lo extraído de la ficha: la descripción solo si falta; la imagen de la
+    ficha sustituye a la miniatura del listado.
+    """
+    if detail.get("description") and not e.get("description"):
+        e["description"] = detail["description"]
+    if detail.get("image_url"):
+        e["image_url"] = detail["image_url"]
+    times = detail.get("times") or []
+    # Horas reales solo en actividades de un único día marcadas como "todo el día"
+    if times and e.get("type") == "activity" and e.get("all_day"):
+        day = (e.get("datetime_start") or "")[:10]
+        if day and day == (e.get("datetime_end") or "")[:10]:
+            e["datetime_start"] = _local_iso(day, times[0])
+            e["datetime_end"] = _local_iso(day, times[1] if len(times) > 1 else times[0])
+            e["all_day"] = False
+    return e
+
+
+def _fetch(mod, url: str, base: str, headers: Optional[dict], max_age: float):
+    key = f"{mod.__name__}.detail.v{getattr(mod, 'DETAIL_VERSION', 1)}"
+    try:
+        return http.fetch_parsed(url, lambda html: mod.parse_detail(html, base),
+                                 key=key, headers=headers, max_age=max_age)
+    except http.DeadlineExceeded:
+        pass
+    except Exception as ex:
+        print(f"[WARN] detail {url} failed: {ex}")
+    # sin respuesta: lo extraído la vez anterior, para que el evento no cambie
+    return (http.load_entry(url).get("parsed") or {}).get(key)
+
+
+def enrich(events: List[dict], institutions: List[dict], workers: int = DEFAULT_WORKERS,
+           budget: float = DEFAULT_BUDGET, max_age_days: float = DEFAULT_MAX_AGE_DAYS) -> List[dict]:
+    """Devuelve `events` (mismo orden) con los datos de sus fichas aplicados."""
+    mods = {}
+    listings = set()   # si un evento apunta al propio listado no hay ficha que leer
+    for inst in institutions:
+        try:
+            mod = importlib.import_module(f"scrapers.{inst['id']}")
+        except Exception:
+            continue
+        if hasattr(mod, "parse_detail"):
+            base = inst.get("base_url") or getattr(mod, "BASE", "")
+            mods[inst["id"]] = (mod, base)
+            listings.update(urljoin(base, ep) for ep in (inst.get("endpoints") or {}).values())
+
+    # Una descarga por URL aunque varios eventos la compartan
+    jobs: Dict[str, tuple] = {}
+    for e in events:
+        inst = e.get("institution_id")
+        url = e.get("url")
+        if inst in mods and url and url not in jobs and url not in listings:
+            jobs[url] = mods[inst]
+    if not jobs:
+        return events
+
+    details: Dict[str, dict] = {}
+    with http.deadline(budget):
+        # copy_context() dentro del `with`: todos los hilos comparten el plazo
+        with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="detail") as pool:
+            futures = {url: pool.submit(copy_context().run, _fetch, mod, url, base,
+                                        getattr(mod, "HEADERS", None), max_age_days * 86400)
+                       for url, (mod, base) in jobs.items()}
+            for url, fut in futures.items():
+                res = fut.result()
+                if res:
+                    details[url] = res
+
+    print(f"[OK] enrich -> {len(details)}/{len(jobs)} detail pages")
+    return [apply_detail(e, details[e["url"]]) if e.get("url") in details else e for e in events]
@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""
+Capa HTTP compartida por los scrapers.
+- Una única requests.Session con pool de conexiones (keep-alive real).
+- Límite de peticiones simultáneas por host (semáforo por netloc) y, opcional,
+  ritmo máximo por host (peticiones/segundo).
+- Plazo (deadline) por scraper: el orquestador lo fija con `deadline()` y cada
+  petición recorta su timeout al tiempo restante.
+- Caché en disco por URL (.cache/http): guarda ETag/Last-Modified, el hash del
+  cuerpo y lo que el scraper extrajo. `fetch_parsed()` manda peticiones
+  condicionales y, si la respuesta es 304 o el cuerpo no ha cambiado, devuelve
+  lo extraído la vez anterior sin volver a parsear. Con `max_age` ni siquiera
+  se pregunta al servidor mientras la entrada sea reciente.
+- Instantáneas (`configure(snapshots=...)`): cada página HTML recibida con 200
+  se guarda comprimida en un scrapers.snapshots.SnapshotStore.
+- Modo replay (`replay()`): las respuestas salen de una función url -> bytes en
+  lugar de la red (benchmarks, re-parseo de instantáneas). En replay
+  `fetch_parsed()` siempre parsea y no lee ni escribe la caché.
+- Métricas: dentro de `metrics_scope(m)` cada petición y cada parseo se anotan en
+  `m` (peticiones, estados HTTP, bytes, tiempos, reutilizaciones de caché).
+"""
+from __future__ import annotations
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+DEFAULT_TIMEOUT = 25
+DEFAULT_PER_HOST = 2
+DEFAULT_CACHE_DIR = os.path.join(ROOT, ".cache", "http")
+POOL_SIZE = 16
+
+_per_host = DEFAULT_PER_HOST
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+_host_lock = threading.Lock()
+_rate: Optional[float] = None            # peticiones/segundo por host (None = sin límite)
+_next_slot: Dict[str, float] = {}        # host -> instante mínimo de la próxima petición
+_deadline: ContextVar[Optional[float]] = ContextVar("scraper_deadline", default=None)
+
+_cache_dir: Optional[str] = DEFAULT_CACHE_DIR
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+_replay: Optional[Callable[[str], Optional[bytes]]] = None
+_snapshots = None                        # scrapers.snapshots.SnapshotStore (None = no se guardan)
+_metrics: ContextVar[Optional["Metrics"]] = ContextVar("fetch_metrics", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """El scraper ha agotado su plazo antes de poder lanzar la petición."""
+
+
+class Metrics:
+    """Contadores de descarga de una sede o etapa; seguro entre hilos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counts: Dict[str, float] = {
+            "requests": 0, "errors": 0, "bytes": 0, "not_modified": 0,
+            "reused": 0, "fresh_hits": 0, "http_seconds": 0.0, "parse_seconds": 0.0,
+        }
+        self.status: Dict[str, int] = {}
+
+    def add(self, key: str, n: float = 1) -> None:
+        with self._lock:
+            self.counts[key] = self.counts.get(key, 0) + n
+
+    def response(self, status, nbytes: int, seconds: float) -> None:
+        with self._lock:
+            self.counts["requests"] += 1
+            self.counts["bytes"] += nbytes
+            self.counts["http_seconds"] += seconds
+            self.status[str(status)] = self.status.get(str(status), 0) + 1
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            out = {k: round(v, 4) if isinstance(v, float) else v for k, v in self.counts.items()}
+            out["status"] = dict(self.status)
+        return out
+
+
+@contextmanager
+def metrics_scope(m: Metrics):
+    """Anota en `m` las peticiones hechas en este contexto (y en sus hilos copiados)."""
+    token = _metrics.set(m)
+    try:
+        yield m
+    finally:
+        _metrics.reset(token)
+
+
+def _note(key: str, n: float = 1) -> None:
+    m = _metrics.get()
+    if m is not None:
+        m.add(key, n)
+
+
+def configure(per_host: Optional[int] = None, cache_dir: Optional[str] = "",
+              rate: Optional[float] = None, snapshots: Any = "") -> None:
+    """
+    Ajusta el límite por host, el ritmo por host, la carpeta de caché y el
+    almacén de instantáneas. Llamar antes de lanzar los scrapers.
+    `cache_dir=None` / `snapshots=None` los desactivan; "" deja el actual.
+    `rate=0` quita el límite de ritmo; None lo deja como estaba.
+    """
+    global _per_host, _cache_dir, _rate, _snapshots
+    if per_host:
+        with _host_lock:
+            _per_host = max(1, int(per_host))
+            _host_slots.clear()
+    if cache_dir != "":
+        _cache_dir = cache_dir
+    if rate is not None:
+        _rate = float(rate) or None
+    if snapshots != "":
+        _snapshots = snapshots
+
+
+def session() -> requests.Session:
+    """Session compartida (se crea la primera vez que se usa)."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            s = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            s.mount("http://", adapter)
+            s.mount("https://", adapter)
+            _session = s
+        return _session
+
+
+def _slot(url: str) -> threading.BoundedSemaphore:
+    host = urlsplit(url).netloc.lower()
+    with _host_lock:
+        sem = _host_slots.get(host)
+        if sem is None:
+            sem = _host_slots[host] = threading.BoundedSemaphore(_per_host)
+        return sem
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """Fija un plazo (en segundos desde ahora) para el contexto actual."""
+    token = _deadline.set(time.monotonic() + seconds if seconds else None)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining(default: float = DEFAULT_TIMEOUT) -> float:
+    """Segundos que quedan del plazo actual (acotado por `default`)."""
+    end = _deadline.get()
+    if end is None:
+        return default
+    left = end - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("scraper deadline exceeded")
+    return min(default, left)
+
+
+def _throttle(url: str) -> None:
+    """Espera lo necesario para no superar `_rate` peticiones/segundo al host."""
+    if not _rate:
+        return
+    host = urlsplit(url).netloc.lower()
+    with _host_lock:
+        now = time.monotonic()
+        at = max(now, _next_slot.get(host, now))
+        _next_slot[host] = at + 1.0 / _rate
+    if at > now:
+        if _deadline.get() is not None and at - now >= remaining():
+            raise DeadlineExceeded(f"rate limit for {host} exceeds deadline")
+        time.sleep(at - now)
+
+
+@contextmanager
+def replay(source: Callable[[str], Optional[bytes]]):
+    """
+    Sirve las peticiones desde `source(url)` (bytes, o None para un 404) sin
+    tocar la red. Afecta a todos los hilos mientras dure el contexto.
+    """
+    global _replay
+    prev, _replay = _replay, source
+    try:
+        yield
+    finally:
+        _replay = prev
+
+
+def replaying() -> bool:
+    """¿Se están sirviendo las peticiones desde `replay()`?"""
+    return _replay is not None
+
+
+def _replayed(url: str) -> requests.Response:
+    body = _replay(url)
+    r = requests.Response()
+    r.url = url
+    r.status_code = 200 if body is not None else 404
+    r._content = body or b""
+    r.headers["Content-Type"] = "text/html; charset=utf-8"
+    r.encoding = "utf-8"
+    r.raise_for_status()
+    return r
+
+
+def _request(url: str, headers: Optional[dict], timeout: float) -> requests.Response:
+    t0 = time.monotonic()
+    try:
+        r = _replayed(url) if _replay is not None else _network(url, headers, timeout)
+    except requests.HTTPError as ex:
+        m, resp = _metrics.get(), ex.response
+        if m is not None and resp is not None:
+            m.response(resp.status_code, len(resp.content or b""), time.monotonic() - t0)
+        _note("errors")
+        raise
+    except requests.RequestException:
+        _note("errors")
+        raise
+    m = _metrics.get()
+    if m is not None:
+        m.response(r.status_code, len(r.content), time.monotonic() - t0)
+    return r
+
+
+def _network(url: str, headers: Optional[dict], timeout: float) -> requests.Response:
+    sem = _slot(url)
+    # esperamos hueco en el host sin pasarnos del plazo (si lo hay)
+    wait = remaining(timeout) if _deadline.get() is not None else None
+    if not sem.acquire(timeout=wait):
+        raise DeadlineExceeded(f"no slot for {urlsplit(url).netloc} before deadline")
+    try:
+        _throttle(url)
+        r = session().get(url, headers=headers, timeout=remaining(timeout), allow_redirects=True)
+        if r.status_code != 304:
+            r.raise_for_status()
+        # sin charset en la cabecera requests asume ISO-8859-1; las sedes sirven UTF-8
+        if "charset" not in r.headers.get("Content-Type", "").lower():
+            r.encoding = "utf-8"
+        return r
+    finally:
+        sem.release()
+
+
+# --- Caché condicional --------------------------------------------------------
+def _sha1(b: bytes) -> str:
+    return hashlib.sha1(b).hexdigest()
+
+
+def _entry_path(url: str) -> Optional[str]:
+    if not _cache_dir:
+        return None
+    return os.path.join(_cache_dir, _sha1(url.encode("utf-8")) + ".json")
+
+
+def load_entry(url: str) -> dict:
+    path = _entry_path(url)
+    if not path:
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def save_entry(url: str, entry: dict) -> None:
+    path = _entry_path(url)
+    if not path:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(entry, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def _age(entry: dict) -> float:
+    try:
+        checked = datetime.fromisoformat(entry["checked_at"])
+    except (KeyError, TypeError, ValueError):
+        return float("inf")
+    return (datetime.now(timezone.utc) - checked).total_seconds()
+
+
+def fetch_parsed(url: str, parse: Callable[[str], Any], key: str,
+                 headers: Optional[dict] = None, timeout: float = DEFAULT_TIMEOUT,
+                 max_age: Optional[float] = None, binary: bool = False) -> Any:
+    """
+    Descarga `url` y devuelve `parse(html)`, reutilizando lo extraído en la
+    ejecución anterior si el servidor responde 304 o el cuerpo es idéntico.
+    `key` identifica al parser (inclúyase su versión): si cambia, se re-parsea.
+    Si `max_age` (segundos) y la entrada se comprobó hace menos, no hay petición.
+    Con `binary=True` el parser recibe los bytes (imágenes) en vez del texto.
+    El resultado debe ser serializable a JSON.
+    """
+    if _replay is not None:
+        r = _request(url, headers, timeout)
+        t0 = time.monotonic()
+        result = parse(r.content if binary else r.text)
+        _note("parse_seconds", time.monotonic() - t0)
+        return result
+
+    entry = load_entry(url)
+    parsed = entry.get("parsed") or {}
+    if max_age and key in parsed and _age(entry) < max_age:
+        _note("fresh_hits")
+        return parsed[key]
+    req_headers = dict(headers or {})
+    # solo condicionamos si tenemos algo que reutilizar
+    if key in parsed:
+        if entry.get("etag"):
+            req_headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            req_headers["If-Modified-Since"] = entry["last_modified"]
+
+    r = _request(url, req_headers, timeout)
+    now = datetime.now(timezone.utc).isoformat()
+
+    if r.status_code == 304 and key in parsed:
+        _note("not_modified")
+        if _snapshots is not None and not binary:
+            _snapshots.touch(url)
+        entry["checked_at"] = now
+        save_entry(url, entry)
+        return parsed[key]
+
+    body_hash = _sha1(r.content)
+    if _snapshots is not None and not binary:
+        try:
+            _snapshots.save(url, r.content)
+        except OSError as ex:
+            print(f"[WARN] snapshot {url} failed: {ex}")
+    if body_hash != entry.get("body_sha1"):
+        parsed = {}
+    if key not in parsed:
+        t0 = time.monotonic()
+        parsed[key] = parse(r.content if binary else r.text)
+        _note("parse_seconds", time.monotonic() - t0)
+    else:
+        _note("reused")
+
+    save_entry(url, {
+        "url": url,
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "body_sha1": body_hash,
+        "fetched_at": now,
+        "checked_at": now,
+        "parsed": parsed,
+    })
+    return parsed[key]
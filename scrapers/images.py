@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+"""
+Miniaturas locales de las imágenes de los eventos.
+- Cada `image_url` se descarga una vez por scrapers.http (ETag/Last-Modified): si
+  no ha cambiado, ni se descarga ni se regenera la miniatura.
+- El original se guarda por hash de contenido en .cache/images/ y la miniatura
+  WebP de ancho fijo en app/static/thumbs/<sha1>_<ancho>.webp (la app la sirve
+  como fichero estático y el navegador la carga con loading="lazy").
+- events.json registra la ruta en `thumb_path`; las miniaturas que ningún evento
+  usa se borran, y con ellas sus originales.
+- Si una imagen falla o no cabe en el plazo se conserva su miniatura anterior
+  (si sigue en disco): el evento no cambia ni vuelve a la imagen a tamaño completo.
+- `offline=True` (collect.py --reparse): solo se usan las miniaturas que la caché
+  ya conoce y siguen en disco; no se descarga nada.
+"""
+from __future__ import annotations
+import hashlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Dict, List, Optional
+
+from scrapers import http
+
+ROOT = http.ROOT
+THUMBS_REL = os.path.join("app", "static", "thumbs")
+THUMBS_DIR = os.path.join(ROOT, THUMBS_REL)
+ORIGINALS_DIR = os.path.join(ROOT, ".cache", "images")
+
+DEFAULT_WIDTH = 480
+DEFAULT_WORKERS = 4
+DEFAULT_BUDGET = 120
+WEBP_QUALITY = 80
+
+
+def make_thumbnail(data: bytes, width: int = DEFAULT_WIDTH) -> Dict[str, str]:
+    """Guarda el original por hash y genera su miniatura. Devuelve sus rutas."""
+    from PIL import Image  # solo lo necesita el recolector
+
+    sha = hashlib.sha1(data).hexdigest()
+    os.makedirs(ORIGINALS_DIR, exist_ok=True)
+    original = os.path.join(ORIGINALS_DIR, sha)
+    if not os.path.exists(original):
+        with open(original, "wb") as f:
+            f.write(data)
+
+    name = f"{sha}_{width}.webp"
+    path = os.path.join(THUMBS_DIR, name)
+    if not os.path.exists(path):
+        os.makedirs(THUMBS_DIR, exist_ok=True)
+        with Image.open(io.BytesIO(data)) as im:
+            im = im.convert("RGBA" if im.mode in ("RGBA", "LA", "P") else "RGB")
+            im.thumbnail((width, width * 4))
+            im.save(path, "WEBP", quality=WEBP_QUALITY, method=4)
+    return {"sha1": sha, "thumb_path": f"{THUMBS_REL}/{name}".replace(os.sep, "/")}
+
+
+def _cached_thumb(url: str, width: int) -> Optional[str]:
+    res = (http.load_entry(url).get("parsed") or {}).get(f"thumb.w{width}")
+    if res and os.path.exists(os.path.join(ROOT, res["thumb_path"])):
+        return res["thumb_path"]
+    return None
+
+
+def _thumb_for(url: str, width: int) -> Optional[str]:
+    key = f"thumb.w{width}"
+    try:
+        res = http.fetch_parsed(url, lambda data: make_thumbnail(data, width), key=key, binary=True)
+        if res and not os.path.exists(os.path.join(ROOT, res["thumb_path"])):
+            # la caché dice que existe pero se borró: se descarga de nuevo
+            http.save_entry(url, {})
+            res = http.fetch_parsed(url, lambda data: make_thumbnail(data, width), key=key, binary=True)
+        return res["thumb_path"] if res else None
+    except http.DeadlineExceeded:
+        pass
+    except Exception as ex:
+        print(f"[WARN] thumbnail {url} failed: {ex}")
+    # sin respuesta: la miniatura de la vez anterior, si sigue en disco
+    return _cached_thumb(url, width)
+
+
+def prune(keep: set) -> int:
+    """Borra miniaturas que ningún evento referencia y los originales que ya no usan."""
+    removed = 0
+    if os.path.isdir(THUMBS_DIR):
+        for name in os.listdir(THUMBS_DIR):
+            if name.startswith("."):
+                continue
+            if f"{THUMBS_REL}/{name}".replace(os.sep, "/") not in keep:
+                os.remove(os.path.join(THUMBS_DIR, name))
+                removed += 1
+    # <sha1>_<ancho>.webp -> el original .cache/images/<sha1>
+    originals = {p.rsplit("/", 1)[-1].split("_", 1)[0] for p in keep}
+    if os.path.isdir(ORIGINALS_DIR):
+        for name in os.listdir(ORIGINALS_DIR):
+            if name not in originals:
+                os.remove(os.path.join(ORIGINALS_DIR, name))
+                removed += 1
+    return removed
+
+
+def attach_thumbnails(events: List[dict], width: int = DEFAULT_WIDTH, workers: int = DEFAULT_WORKERS,
+                      budget: float = DEFAULT_BUDGET, offline: bool = False) -> List[dict]:
+    """Añade `thumb_path` a los eventos con imagen; devuelve la misma lista."""
+    urls = sorted({e["image_url"] for e in events if e.get("image_url")})
+    if not urls:
+        return events
+
+    thumbs: Dict[str, str] = {}
+    if offline:
+        for u in urls:
+            path = _cached_thumb(u, width)
+            if path:
+                thumbs[u] = path
+    else:
+        with http.deadline(budget):
+            with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="thumb") as pool:
+                futures = {u: pool.submit(copy_context().run, _thumb_for, u, width) for u in urls}
+                for u, fut in futures.items():
+                    path = fut.result()
+                    if path:
+                        thumbs[u] = path
+
+    for e in events:
+        path = thumbs.get(e.get("image_url"))
+        if path:
+            e["thumb_path"] = path
+        else:
+            e.pop("thumb_path", None)
+    removed = 0
+    if not offline:
+        # una URL rota no bloquea la poda: se conserva lo que tuviera en disco
+        keep = set(thumbs.values())
+        keep.update(p for p in (_cached_thumb(u, width) for u in urls if u not in thumbs) if p)
+        removed = prune(keep)
+    print(f"[OK] thumbnails -> {len(thumbs)}/{len(urls)} images ({removed} stale removed)")
+    return events
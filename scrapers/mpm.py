@@ -2,95 +2,45 @@
 """
 Scraper para Museo Picasso Málaga (MPM)
 - Exposiciones: se extraen desde el listado (fechas DD/MM/YYYY, título, imagen).
-- Actividades: se extraen desde las tarjetas del listado (rango de fechas en ES + <h2>).
-Si el runner no ve actividades, se vuelca el HTML a data/debug_mpm_activities.html.
+- Actividades: se extraen desde las tarjetas del listado (rango de fechas en ES + <h2>);
+  si la tarjeta enumera días sueltos se guardan en `occurrences`. Si la sede
+  configura `pagination.activities`, el listado se recorre por páginas con
+  scrapers.crawl (parada temprana en cuanto todo es conocido).
+El HTML se parsea con lxml + XPath precompiladas; las tarjetas de exposición se
+resuelven (enlace e imagen) en un único recorrido del documento.
+Las descargas pasan por scrapers.http: si el listado no ha cambiado (304 o mismo
+hash) se reutilizan los eventos extraídos en la ejecución anterior.
+Si el runner no ve actividades, el HTML recibido queda en las instantáneas
+(.cache/snapshots) para revisarlo o re-parsearlo con `collect.py --reparse`.
 """
 from __future__ import annotations
-import os, re, hashlib
+import re, hashlib
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
 from urllib.parse import urljoin
 from typing import List, Dict, Any, Optional
-import requests
-from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
+
+from scrapers import crawl, http
+from scrapers.dates import has_month, key_dates, parse_dates
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; MalagaCulturalBot/1.0; +https://example.com)",
     "Accept-Language": "es-ES,es;q=0.9,en;q=0.8",
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
-    "Cache-Control": "no-cache",
-    "Pragma": "no-cache",
     "Referer": "https://www.museopicassomalaga.org/actividades",
     "Connection": "keep-alive",
 }
 BASE = "https://www.museopicassomalaga.org"
 
-MONTHS = {
-    'enero':1,'febrero':2,'marzo':3,'abril':4,'mayo':5,'junio':6,
-    'julio':7,'agosto':8,'septiembre':9,'setiembre':9,'octubre':10,'noviembre':11,'diciembre':12
-}
 CATEGORY_WORDS = {'talleres','conferencias','musicas','músicas'}
 
 def _sha1(s: str) -> str:
     return hashlib.sha1(s.encode("utf-8")).hexdigest()
 
-def _abs(url: str) -> str:
-    return url if url.startswith("http") else urljoin(BASE, url)
-
-def _get(url: str) -> BeautifulSoup:
-    r = requests.get(url, headers=HEADERS, timeout=25, allow_redirects=True)
-    r.raise_for_status()
-    return BeautifulSoup(r.text, "lxml")
-
-def _norm(s: str) -> str:
-    import unicodedata
-    s = unicodedata.normalize('NFKD', s)
-    s = "".join([c for c in s if not unicodedata.combining(c)])
-    s = s.replace('\xa0',' ').replace('�','-')
-    s = re.sub(r'[–—]+', '-', s)   # guiones largos -> '-'
-    s = re.sub(r'-{2,}', '-', s)   # '——' -> '-'
-    s = re.sub(r'\s*-\s*', '-', s) # espacios alrededor del guion
-    s = re.sub(r'\s+', ' ', s).strip()
-    return s.lower()
-
-def _parse_spanish_date_range(text: str):
-    """Devuelve (date_start, date_end, remainder_text) en YYYY-MM-DD."""
-    t = _norm(text)
-    # dd mes yyyy - dd mes yyyy
-    m = re.search(r'(\d{1,2})\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre)\s+(\d{4})-(\d{1,2})\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre)\s+(\d{4})', t)
-    if m:
-        d1, mon1, y1, d2, mon2, y2 = m.groups()
-        ds=f"{y1}-{MONTHS[mon1]:02d}-{int(d1):02d}"
-        de=f"{y2}-{MONTHS[mon2]:02d}-{int(d2):02d}"
-        return ds, de, t[m.end():].strip()
-    # dd - dd mes yyyy
-    m = re.search(r'(\d{1,2})-(\d{1,2})\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre)\s+(\d{4})', t)
-    if m:
-        d1, d2, mon, y = m.groups()
-        ds=f"{y}-{MONTHS[mon]:02d}-{int(d1):02d}"
-        de=f"{y}-{MONTHS[mon]:02d}-{int(d2):02d}"
-        return ds, de, t[m.end():].strip()
-    # mes - mes yyyy (aprox 1..28)
-    m = re.search(r'(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre)-(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre)\s+(\d{4})', t)
-    if m:
-        mon1, mon2, y = m.groups()
-        ds=f"{y}-{MONTHS[mon1]:02d}-01"
-        de=f"{y}-{MONTHS[mon2]:02d}-28"
-        return ds, de, t[m.end():].strip()
-    # 1, 8, 15, 22 y 29 octubre 2025
-    m = re.search(r'(\d{1,2}(?:\s*,\s*\d{1,2})*(?:\s*y\s*\d{1,2})?)\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre)\s+(\d{4})', t)
-    if m:
-        days_list, mon, y = m.groups()
-        days = [int(x.strip()) for x in re.split(r'[,\sy]+', days_list) if x.strip().isdigit()]
-        if days:
-            ds=f"{y}-{MONTHS[mon]:02d}-{min(days):02d}"
-            de=f"{y}-{MONTHS[mon]:02d}-{max(days):02d}"
-            return ds, de, t[m.end():].strip()
-    # dd mes yyyy (día único)
-    m = re.search(r'(\d{1,2})\s+(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre)\s+(\d{4})', t)
-    if m:
-        d, mon, y = m.groups()
-        ds=f"{y}-{MONTHS[mon]:02d}-{int(d):02d}"
-        return ds, ds, t[m.end():].strip()
-    return None
+def _abs(url: str, base: str = BASE) -> str:
+    return url if url.startswith("http") else urljoin(base, url)
 
 def _clean_title_from_rest(rest: str) -> Optional[str]:
     if not rest:
@@ -103,145 +53,275 @@ def _clean_title_from_rest(rest: str) -> Optional[str]:
         words = words[:-1]
     return " ".join(words).strip(" -·,;") or None
 
+INSTITUTION_ID = "mpm"
+INSTITUTION_NAME = "Museo Picasso Málaga"
+# Súbela al cambiar el parseo: invalida los eventos cacheados por scrapers.http
+PARSER_VERSION = 7
+
 def collect(config: dict) -> List[Dict[str, Any]]:
-    institution_id = "mpm"
-    institution_name = "Museo Picasso Málaga"
-    events: List[Dict[str, Any]] = []
+    # Exposiciones y actividades en paralelo; el orden del resultado es fijo.
+    # copy_context() propaga el plazo del orquestador a cada hilo.
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        futures = [pool.submit(copy_context().run, fn, config)
+                   for fn in (_collect_exhibitions, _collect_activities)]
+        events: List[Dict[str, Any]] = []
+        for fut in futures:
+            events.extend(fut.result())
+    return events
+
+# ── Utilidades lxml ───────────────────────────────────────────────────────────
+# Equivalentes de get_text(strip=True) / get_text(" ", strip=True) de BeautifulSoup
+def _text(el, sep: str = "") -> str:
+    return sep.join(t.strip() for t in el.itertext() if t.strip())
+
+def _has_class(el, name: str) -> bool:
+    cls = el.get("class")
+    return bool(cls) and name in cls.split()
+
+def _doc(html: str):
+    if not html or not html.strip():
+        return None
+    return lxml.html.fromstring(html)
 
-    # ── Exposiciones ──────────────────────────────────────────────────────────
+def _xp_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+_XP_EXH_DATES = etree.XPath(f".//*[{_xp_class('exhibitionCurrentFuture-date')}]")
+_XP_EXH_TITLE = etree.XPath(f".//*[{_xp_class('h1')}]")
+_XP_EXH_LINK = etree.XPath(".//a[contains(@href, '/exposiciones/')]")
+_XP_CARDS = etree.XPath(
+    f"//*[{_xp_class('color-card-container')} and {_xp_class('three-columns')}]"
+    f"//a[{_xp_class('colorCard')} and contains(@href, '/actividades/')]")
+_XP_CARDS_ANY = etree.XPath(f"//a[{_xp_class('colorCard')} and contains(@href, '/actividades/')]")
+_XP_ACT_LINKS = etree.XPath("//a[contains(@href, '/actividades/')]")
+_XP_HEADING = etree.XPath(".//*[self::h2 or self::h3]")
+_BG_URL = re.compile(r"url\(['\"]?(.*?)['\"]?\)")
+
+# ── Exposiciones ──────────────────────────────────────────────────────────────
+def _collect_exhibitions(config: dict) -> List[Dict[str, Any]]:
+    base = config.get("base_url") or BASE
+    url = _abs(config["endpoints"]["exhibitions"], base)
     try:
-        soup = _get(_abs(config["endpoints"]["exhibitions"]))
-        for info in soup.select('.exhibitionCurrentFuture-info'):
-            dates = info.select('.exhibitionCurrentFuture-date')
-            if not dates:
-                continue
-            date_start = dates[0].get_text(strip=True)
-            date_end = dates[1].get_text(strip=True) if len(dates) > 1 else date_start
-
-            def ddmmyyyy(s):
-                d,m,y = s.split('/')
-                return f"{int(y):04d}-{int(m):02d}-{int(d):02d}"
-            try:
-                ds = ddmmyyyy(date_start)
-                de = ddmmyyyy(date_end)
-            except Exception:
-                continue
-
-            tnode = info.select_one('p.h1, .h1')
-            title = tnode.get_text(" ", strip=True) if tnode else "Exposición"
-
-            a = info.find('a', href=re.compile(r'/exposiciones/')) or info.find_previous('a', href=re.compile(r'/exposiciones/'))
-            link = _abs(a['href']) if a and a.get('href') else _abs(config["endpoints"]["exhibitions"])
-
-            bg = info.find_previous(class_=re.compile('exhibitionCurrentFuture-background'))
-            image_url = None
-            if bg:
-                style = bg.get('style','')
-                m = re.search(r"url\(['\"]?(.*?)['\"]?\)", style)
-                if m:
-                    image_url = _abs(m.group(1))
-                else:
-                    img = bg.find('img')
-                    if img and img.get('src'):
-                        image_url = _abs(img['src'])
-
-            key = f"exhibition|{institution_id}|{link}|{ds}|{de}".lower()
-            events.append({
-                "id": _sha1(key),
-                "type": "exhibition",
-                "title": title,
-                "description": None,
-                "image_url": image_url,
-                "institution_id": institution_id,
-                "institution_name": institution_name,
-                "city": "Málaga",
-                "url": link,
-                "date_start": ds,
-                "date_end": de,
-                "status": "scheduled",
-                "all_day": True,
-                "source": "scraper",
-            })
+        return http.fetch_parsed(url, lambda html: parse_exhibitions(html, base, url),
+                                 key=f"mpm.exhibitions.v{PARSER_VERSION}", headers=HEADERS)
     except Exception as e:
         print(f"[WARN] mpm exhibitions failed: {e}")
+        return []
 
-    # ── Actividades ───────────────────────────────────────────────────────────
-    try:
-        soup = _get(_abs(config["endpoints"]["activities"]))
-        # 1) Selector típico (tu HTML)
-        cards = soup.select(".color-card-container.three-columns a.colorCard[href*='/actividades/']")
-        # 2) Fallbacks por si el contenedor cambia
-        if not cards:
-            cards = soup.select("a.colorCard[href*='/actividades/']")
-        if not cards:
-            cards = [a for a in soup.find_all('a', href=True) if '/actividades/' in a['href'] and not a['href'].rstrip('/').endswith('/actividades')]
-
-        seen = set()
-        found = 0
-        for a in cards:
-            href = a.get('href','')
-            link = _abs(href.split('#')[0])
-            if link in seen:
-                continue
-            seen.add(link)
-
-            # Fechas (primer <p> con nombres de mes) + título (<h2> o <h3>)
-            p_dates = None
-            for p in a.find_all("p"):
-                txt = p.get_text(" ", strip=True)
-                if re.search(r"(enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|setiembre|octubre|noviembre|diciembre)", txt, re.I):
-                    p_dates = txt; break
-            h2 = a.find(["h2","h3"])
-            title = h2.get_text(" ", strip=True) if h2 else None
-
-            base_text = p_dates or a.get_text(" ", strip=True)
-            parsed = _parse_spanish_date_range(base_text)
-            if not parsed:
-                continue
-            ds, de, rest = parsed
-            if not title:
-                title = _clean_title_from_rest(rest) or "Actividad"
-
-            img = a.find("img")
-            image_url = _abs(img["src"]) if img and img.get("src") else None
-
-            dt_start = ds + "T00:00:00+02:00"
-            dt_end   = de + "T23:59:00+02:00"
-
-            key = f"activity|{institution_id}|{link}|{dt_start}|{dt_end}".lower()
-            events.append({
-                "id": _sha1(key),
-                "type": "activity",
-                "title": title,
-                "description": None,
-                "image_url": image_url,
-                "institution_id": institution_id,
-                "institution_name": institution_name,
-                "city": "Málaga",
-                "url": link,
-                "datetime_start": dt_start,
-                "datetime_end": dt_end,
-                "all_day": True,
-                "status": "scheduled",
-                "source": "scraper",
-            })
-            found += 1
-
-        if found == 0:
-            # DEBUG: volcar HTML y anclas para ver qué recibe el runner
-            try:
-                data_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
-                os.makedirs(data_dir, exist_ok=True)
-                with open(os.path.join(data_dir, "debug_mpm_activities.html"), "w", encoding="utf-8") as f:
-                    f.write(str(soup))
-                anchors = [a.get('href','') for a in soup.find_all('a', href=True) if '/actividades/' in a.get('href','')]
-                with open(os.path.join(data_dir, "debug_mpm_anchors.txt"), "w", encoding="utf-8") as f:
-                    f.write("\n".join(anchors))
-                print("[DBG] mpm: 0 activities -> wrote data/debug_mpm_activities.html and debug_mpm_anchors.txt")
-            except Exception as _e:
-                print(f"[DBG] mpm: failed to write debug files: {_e}")
+def _exhibition_cards(doc):
+    """
+    Un único recorrido en orden de documento: para cada bloque
+    .exhibitionCurrentFuture-info devuelve (info, último <a> a /exposiciones/,
+    último fondo .exhibitionCurrentFuture-background) vistos antes que él, que es
+    lo que devolvían los find_previous() de la versión con BeautifulSoup.
+    """
+    last_a = last_bg = None
+    for el in doc.iter():
+        if not isinstance(el.tag, str):
+            continue   # comentarios / instrucciones
+        if el.tag == "a" and "/exposiciones/" in (el.get("href") or ""):
+            last_a = el
+        cls = el.get("class") or ""
+        if "exhibitionCurrentFuture-background" in cls:
+            last_bg = el
+        if "exhibitionCurrentFuture-info" in cls and _has_class(el, "exhibitionCurrentFuture-info"):
+            yield el, last_a, last_bg
+
+def _ddmmyyyy(s: str) -> str:
+    d, m, y = s.split('/')
+    return f"{int(y):04d}-{int(m):02d}-{int(d):02d}"
+
+def parse_exhibitions(html: str, base: str = BASE, listing_url: Optional[str] = None) -> List[Dict[str, Any]]:
+    institution_id = INSTITUTION_ID
+    institution_name = INSTITUTION_NAME
+    listing_url = listing_url or _abs("/exposiciones", base)
+    events: List[Dict[str, Any]] = []
+    doc = _doc(html)
+    if doc is None:
+        return events
+    for info, prev_a, bg in _exhibition_cards(doc):
+        dates = _XP_EXH_DATES(info)
+        if not dates:
+            continue
+        date_start = _text(dates[0])
+        date_end = _text(dates[1]) if len(dates) > 1 else date_start
+        try:
+            ds = _ddmmyyyy(date_start)
+            de = _ddmmyyyy(date_end)
+        except Exception:
+            continue
+
+        tnodes = _XP_EXH_TITLE(info)
+        title = _text(tnodes[0], " ") if tnodes else "Exposición"
+
+        links = _XP_EXH_LINK(info)
+        a = links[0] if links else prev_a
+        link = _abs(a.get('href'), base) if a is not None and a.get('href') else listing_url
+
+        image_url = None
+        if bg is not None:
+            m = _BG_URL.search(bg.get('style', ''))
+            if m:
+                image_url = _abs(m.group(1), base)
+            else:
+                img = bg.find('.//img')
+                if img is not None and img.get('src'):
+                    image_url = _abs(img.get('src'), base)
 
+        key = f"exhibition|{institution_id}|{link}|{ds}|{de}".lower()
+        events.append({
+            "id": _sha1(key),
+            "type": "exhibition",
+            "title": title,
+            "description": None,
+            "image_url": image_url,
+            "institution_id": institution_id,
+            "institution_name": institution_name,
+            "city": "Málaga",
+            "url": link,
+            "date_start": ds,
+            "date_end": de,
+            "status": "scheduled",
+            "all_day": True,
+            "source": "scraper",
+        })
+    return events
+
+# ── Actividades ───────────────────────────────────────────────────────────────
+def _collect_activities(config: dict) -> List[Dict[str, Any]]:
+    base = config.get("base_url") or BASE
+    url = _abs(config["endpoints"]["activities"], base)
+    pages = (config.get("pagination") or {}).get("activities") or {}
+    template = pages.get("page_url")
+    urls = crawl.page_urls(url, _abs(template, base) if template else None, int(pages.get("first", 1)),
+                           int(pages.get("max_pages", crawl.DEFAULT_MAX_PAGES)))
+
+    def parse(html: str, page_url: str) -> List[Dict[str, Any]]:
+        events = parse_activities(html, base)
+        if not events and page_url == url:
+            print(f"[WARN] mpm: 0 activities in {url} (HTML kept in .cache/snapshots)")
+        return events
+
+    try:
+        return crawl.crawl("mpm.activities", urls, parse, key=f"mpm.activities.v{PARSER_VERSION}",
+                           headers=HEADERS, workers=int(pages.get("workers", crawl.DEFAULT_WORKERS)),
+                           full_every_days=float(pages.get("full_every_days", crawl.DEFAULT_FULL_EVERY_DAYS)))
     except Exception as e:
         print(f"[WARN] mpm activities failed: {e}")
+        return []
+
+def _activity_cards(doc) -> list:
+    # 1) Selector típico (tu HTML)
+    cards = _XP_CARDS(doc)
+    # 2) Fallbacks por si el contenedor cambia
+    if not cards:
+        cards = _XP_CARDS_ANY(doc)
+    if not cards:
+        cards = [a for a in _XP_ACT_LINKS(doc) if not a.get('href').rstrip('/').endswith('/actividades')]
+    return cards
+
+def parse_activities(html: str, base: str = BASE) -> List[Dict[str, Any]]:
+    institution_id = INSTITUTION_ID
+    institution_name = INSTITUTION_NAME
+    events: List[Dict[str, Any]] = []
+    doc = _doc(html)
+    if doc is None:
+        return events
+
+    seen = set()
+    for a in _activity_cards(doc):
+        href = a.get('href') or ''
+        link = _abs(href.split('#')[0], base)
+        if link in seen:
+            continue
+        seen.add(link)
+
+        # Fechas (primer <p> con nombres de mes) + título (<h2> o <h3>)
+        p_dates = None
+        for p in a.iter("p"):
+            txt = _text(p, " ")
+            if has_month(txt):
+                p_dates = txt; break
+        heads = _XP_HEADING(a)
+        title = _text(heads[0], " ") if heads else None
 
+        base_text = p_dates or _text(a, " ")
+        parsed = parse_dates(base_text)
+        if not parsed:
+            continue
+        ds, de, rest, days = parsed
+        if not title:
+            title = _clean_title_from_rest(rest) or "Actividad"
+
+        img = a.find(".//img")
+        image_url = _abs(img.get("src"), base) if img is not None and img.get("src") else None
+
+        dt_start = ds + "T00:00:00+02:00"
+        dt_end   = de + "T23:59:00+02:00"
+
+        # la clave del id usa las fechas de la gramática v1: ids estables
+        ks, ke = key_dates(base_text) or (ds, de)
+        key = f"activity|{institution_id}|{link}|{ks}T00:00:00+02:00|{ke}T23:59:00+02:00".lower()
+        ev = {
+            "id": _sha1(key),
+            "type": "activity",
+            "title": title,
+            "description": None,
+            "image_url": image_url,
+            "institution_id": institution_id,
+            "institution_name": institution_name,
+            "city": "Málaga",
+            "url": link,
+            "datetime_start": dt_start,
+            "datetime_end": dt_end,
+            "all_day": True,
+            "status": "scheduled",
+            "source": "scraper",
+        }
+        if days:
+            ev["occurrences"] = list(days)   # "1, 8 y 15 octubre": solo esos días
+        events.append(ev)
     return events
+
+# ── Fichas (detalle) ──────────────────────────────────────────────────────────
+# Usado por scrapers.enrich; súbela al cambiar parse_detail
+DETAIL_VERSION = 1
+
+_XP_META = etree.XPath("//meta[@property=$name or @name=$name]/@content")
+_XP_BODY_P = etree.XPath("//main//p | //article//p")
+# "11:00", "11:00 h" o "11.00 h" (con punto solo si lleva "h": "7.50 €" no es hora)
+_HOURS = re.compile(r"\b([01]?\d|2[0-3])(?::([0-5]\d)|\.([0-5]\d)\s*h\b)")
+MIN_DESCRIPTION = 60
+
+def _meta(doc, name: str) -> Optional[str]:
+    vals = _XP_META(doc, name=name)
+    return vals[0].strip() if vals and vals[0].strip() else None
+
+def parse_detail(html: str, base: str = BASE) -> Dict[str, Any]:
+    """
+    Extrae de la ficha de un evento: descripción, imagen (og:image, mejor
+    calidad que la miniatura del listado) y horas "HH:MM" en orden de aparición.
+    """
+    doc = _doc(html)
+    if doc is None:
+        return {}
+    description = None
+    for p in _XP_BODY_P(doc):
+        txt = _text(p, " ")
+        if len(txt) >= MIN_DESCRIPTION:
+            description = txt
+            break
+    description = description or _meta(doc, "og:description") or _meta(doc, "description")
+
+    image = _meta(doc, "og:image")
+    times = []
+    for p in _XP_BODY_P(doc):
+        for h, m1, m2 in _HOURS.findall(_text(p, " ")):
+            t = f"{int(h):02d}:{m1 or m2}"
+            if t not in times:
+                times.append(t)
+    return {
+        "description": description,
+        "image_url": _abs(image, base) if image else None,
+        "times": times[:2],
+    }
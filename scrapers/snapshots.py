@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Instantáneas de las páginas descargadas (.cache/snapshots), para re-parsear sin red.
+- Direccionadas por contenido: objects/<sha1[:2]>/<sha1>.gz (gzip). Una página
+  que no cambia entre ejecuciones no ocupa más.
+- index.json: por URL, sus instantáneas {"sha1", "fetched_at"} de la más reciente
+  a la más antigua. Se escribe al final (`flush()` o `prune()`), no por página.
+- Retención acotada: como mucho `keep` instantáneas por URL y ninguna más antigua
+  que `max_age_days`. La última se conserva mientras la URL se siga descargando;
+  una URL que no se ha visto en `max_age_days` (una ficha de un evento ya
+  retirado) sale del índice. `prune()` borra los objetos que ya no referencia nadie.
+- `source(before)` devuelve una función url -> bytes para `http.replay()`: la
+  última instantánea de cada URL o la última tomada antes de una fecha.
+scrapers.http guarda aquí cada página HTML que recibe con 200 si se configura con
+`http.configure(snapshots=SnapshotStore())`.
+"""
+from __future__ import annotations
+import gzip
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DEFAULT_DIR = os.path.join(ROOT, ".cache", "snapshots")
+DEFAULT_KEEP = 5
+DEFAULT_MAX_AGE_DAYS = 90
+
+
+class SnapshotStore:
+    def __init__(self, root: str = DEFAULT_DIR, keep: int = DEFAULT_KEEP,
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.root = root
+        self.keep = max(1, int(keep))
+        self.max_age = timedelta(days=max_age_days) if max_age_days else None
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._index_path = os.path.join(root, "index.json")
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                self._index: Dict[str, List[dict]] = json.load(f)
+        except Exception:
+            self._index = {}
+
+    def _object(self, sha: str) -> str:
+        return os.path.join(self.root, "objects", sha[:2], sha + ".gz")
+
+    def _write_index(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        tmp = f"{self._index_path}.{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._index, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, self._index_path)
+
+    def _retain(self, snaps: List[dict]) -> List[dict]:
+        kept = snaps[:self.keep]
+        if self.max_age and kept:
+            limit = (datetime.now(timezone.utc) - self.max_age).isoformat()
+            # la última vez que se vio la URL (misma página: checked_at)
+            if max(kept[0]["fetched_at"], kept[0].get("checked_at", "")) < limit:
+                return []
+            kept = kept[:1] + [s for s in kept[1:] if s["fetched_at"] >= limit]
+        return kept
+
+    def save(self, url: str, body: bytes) -> str:
+        """Guarda `body` como la instantánea más reciente de `url`; devuelve su SHA1."""
+        sha = hashlib.sha1(body).hexdigest()
+        path = self._object(sha)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp = f"{path}.{threading.get_ident()}.tmp"
+            with gzip.open(tmp, "wb", compresslevel=6) as f:
+                f.write(body)
+            os.replace(tmp, path)
+        now = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            snaps = self._index.get(url, [])
+            if snaps and snaps[0]["sha1"] == sha:
+                snaps[0]["checked_at"] = now      # misma página: no se añade otra
+            else:
+                snaps.insert(0, {"sha1": sha, "fetched_at": now})
+            self._index[url] = self._retain(snaps)
+            self._dirty = True
+        return sha
+
+    def touch(self, url: str) -> None:
+        """La URL sigue viva sin cambios (304): cuenta para la retención."""
+        with self._lock:
+            snaps = self._index.get(url)
+            if snaps:
+                snaps[0]["checked_at"] = datetime.now(timezone.utc).isoformat()
+                self._dirty = True
+
+    def flush(self) -> None:
+        """Escribe index.json si hay instantáneas nuevas (una vez por ejecución)."""
+        with self._lock:
+            if self._dirty:
+                self._write_index()
+                self._dirty = False
+
+    def history(self, url: str) -> List[dict]:
+        return list(self._index.get(url, []))
+
+    def load(self, sha: str) -> Optional[bytes]:
+        try:
+            with gzip.open(self._object(sha), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def latest(self, url: str, before: Optional[str] = None) -> Optional[bytes]:
+        """Última instantánea de `url` (o la última tomada antes de `before`, ISO)."""
+        for snap in self._index.get(url, []):
+            if before is None or snap["fetched_at"] < before:
+                return self.load(snap["sha1"])
+        return None
+
+    def source(self, before: Optional[str] = None) -> Callable[[str], Optional[bytes]]:
+        return lambda url: self.latest(url, before)
+
+    def prune(self) -> int:
+        """Aplica la retención y borra los objetos sin referencias. Devuelve cuántos."""
+        with self._lock:
+            for url in list(self._index):
+                kept = self._retain(self._index[url])
+                if kept:
+                    self._index[url] = kept
+                else:
+                    del self._index[url]
+            self._write_index()
+            self._dirty = False
+            live = {s["sha1"] for snaps in self._index.values() for s in snaps}
+        removed = 0
+        objects = os.path.join(self.root, "objects")
+        for dirpath, _, names in os.walk(objects):
+            for name in names:
+                if name.endswith(".gz") and name[:-3] not in live:
+                    os.remove(os.path.join(dirpath, name))
+                    removed += 1
+        return removed
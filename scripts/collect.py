@@ -2,15 +2,37 @@
 """
 Collector orchestrator.
 - Lee config/institutions.yaml
-- Ejecuta scrapers activos
-- Fusiona con manual_events.json (manual > scraper)
-- Escribe data/events.json y data/meta.json
+- Ejecuta scrapers activos en paralelo (pool acotado, límite por host, plazo por scraper)
+- Enriquece los eventos con su ficha de detalle (descripción, horas, imagen)
+- Genera miniaturas locales de las imágenes (app/static/thumbs)
+- Fusiona con manual_events.json (manual > scraper); los manuales casi idénticos a
+  uno scrapeado se fusionan o se listan en data/duplicates.json para revisarlos
+- Precalcula campos de visualización (ts_start/ts_end, date_label, weekday)
+- Calcula un hash de contenido por evento y lo compara con el events.json anterior:
+  si nada cambió no reescribe ningún fichero; si cambió, escribe data/events_delta.json
+- Escribe data/events.json, data/meta.json y (opcional) data/events.sqlite
+- Construye los índices de la app: búsqueda (data/search_index.json), facetas
+  por sede y tipo con inicios/finales ordenados (data/facets.json) y ocurrencias por día
+  (data/occurrences.json)
+- Genera feeds iCalendar en data/feeds (solo los que cambian)
+- Guarda cada página descargada como instantánea comprimida (.cache/snapshots);
+  con --reparse reconstruye events.json desde ellas, sin red
+- Mide cada etapa y cada sede (tiempo, peticiones, bytes, estados HTTP, parseo) y
+  lo guarda en .cache/metrics (last_run.json e history.jsonl rotativo), fuera
+  de data/ para que una ejecución sin cambios no genere commit; meta.json lleva
+  un resumen (ok/eventos/tiempo por sede) de la ejecución que generó los datos
 - Imprime conteo por tipo (exhibition/activity)
 """
 import os
 import sys
 import json
+import time
+import argparse
 import importlib
+from contextlib import ExitStack, contextmanager
+import queue
+import threading
+from contextvars import copy_context
 from copy import deepcopy
 from datetime import datetime, timezone
 
@@ -21,11 +43,38 @@ ROOT = os.path.dirname(os.path.dirname(__file__))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
 
+from scrapers import http, enrich, images, snapshots  # noqa: E402
+from common import dedupe, display, facets, feeds, occurrences, search, store  # noqa: E402
+
 CONFIG_PATH = os.path.join(ROOT, "config", "institutions.yaml")
 DATA_DIR = os.path.join(ROOT, "data")
 EVENTS_PATH = os.path.join(DATA_DIR, "events.json")
 MANUAL_PATH = os.path.join(DATA_DIR, "manual_events.json")
 META_PATH = os.path.join(DATA_DIR, "meta.json")
+STORE_PATH = os.path.join(DATA_DIR, "events.sqlite")
+DELTA_PATH = os.path.join(DATA_DIR, "events_delta.json")
+# Métricas por ejecución: fuera de data/ (que se sube al repo) para no generar un
+# commit en cada cron; el workflow conserva .cache entre ejecuciones
+METRICS_DIR = os.path.join(ROOT, ".cache", "metrics")
+LAST_RUN_PATH = os.path.join(METRICS_DIR, "last_run.json")
+METRICS_PATH = os.path.join(METRICS_DIR, "history.jsonl")
+SEARCH_PATH = os.path.join(DATA_DIR, "search_index.json")
+FACETS_PATH = os.path.join(DATA_DIR, "facets.json")
+OCCURRENCES_PATH = os.path.join(DATA_DIR, "occurrences.json")
+DUPLICATES_PATH = os.path.join(DATA_DIR, "duplicates.json")
+FEEDS_DIR = os.path.join(DATA_DIR, "feeds")
+DEFAULT_METRICS_KEEP = 365   # ejecuciones que se conservan en el histórico
+
+# Campos que cambian en cada ejecución sin que cambie el evento
+VOLATILE_FIELDS = ("last_seen_at", "content_hash")
+
+# Valores por defecto del bloque `collect:` de institutions.yaml
+DEFAULT_WORKERS = 8
+DEFAULT_PER_HOST = 2
+DEFAULT_DEADLINE = 120   # segundos por scraper
+DEADLINE_GRACE = 10      # margen antes de abandonar un scraper colgado
+ABANDONED = set()        # sedes abandonadas en esta ejecución (hilos aún vivos)
+DEFAULT_AUTO_MERGE = 0.85  # score a partir del cual un manual se fusiona con su casi-duplicado
 
 # --- Utilidades --------------------------------------------------------------
 def sha1(s: str) -> str:
@@ -66,57 +115,290 @@ def normalize_event(e: dict) -> dict:
     e.setdefault("schema_version", "1")
     if not e.get("id"):
         e["id"] = sha1(key_for_event(e))
+    # Campos de visualización precalculados (la app no vuelve a parsear fechas)
+    e.update(display.derive(e) or {})
     return e
 
-def merge_events(scraped: list, manual: list) -> list:
+def content_hash(e: dict) -> str:
+    stable = {k: v for k, v in e.items() if k not in VOLATILE_FIELDS}
+    return sha1(json.dumps(stable, ensure_ascii=False, sort_keys=True))
+
+def dataset_hash(events: list) -> str:
+    return sha1("\n".join(sorted(f"{e['id']}:{e['content_hash']}" for e in events)))
+
+def load_previous(path: str) -> dict:
+    """{id: content_hash} del events.json anterior (vacío si no hay)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            prev = json.load(f)
+    except Exception:
+        return {}
+    return {e["id"]: e.get("content_hash") or content_hash(e) for e in prev if e.get("id")}
+
+def index_version(path: str):
+    """Versión de un índice ya escrito (None si falta o no se puede leer)."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f).get("version")
+    except Exception:
+        return None
+
+def diff_events(prev: dict, events: list) -> dict:
+    cur = {e["id"]: e["content_hash"] for e in events}
+    return {
+        "added": sorted(i for i in cur if i not in prev),
+        "removed": sorted(i for i in prev if i not in cur),
+        "modified": sorted(i for i in cur if i in prev and prev[i] != cur[i]),
+    }
+
+def write_json(path: str, data, indent=2) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent,
+                  separators=None if indent else (",", ":"))
+
+def merge_events(scraped: list, manual: list, auto_merge=None, duplicates=None) -> list:
+    """
+    Fusiona scrapeados y manuales (manual > scraper). Los manuales sin el mismo id
+    se buscan entre los scrapeados (common/dedupe.py): con score >= `auto_merge`
+    se fusionan con su pareja; si se pasa la lista `duplicates`, se añade a ella
+    cada pareja encontrada con su score y la acción tomada.
+    """
     by_id = {}
     for e in scraped:
         ne = normalize_event(e)
         by_id[ne["id"]] = ne
-    for m in manual:
-        nm = normalize_event(m)
+    nmanual = [normalize_event(m) for m in manual]
+
+    alias = {}   # id manual -> id scrapeado con el que se fusiona
+    if auto_merge or duplicates is not None:
+        loose = [nm for nm in nmanual if nm["id"] not in by_id]
+        scraped_norm = [e for e in by_id.values() if e.get("source") != "manual"]
+        for m in dedupe.find_duplicates(loose, scraped_norm):
+            merge = bool(auto_merge) and m["score"] >= auto_merge
+            if merge:
+                alias[m["id"]] = m["match_id"]
+            if duplicates is not None:
+                duplicates.append(dict(m, action="merged" if merge else "review"))
+
+    for nm in nmanual:
+        target = alias.get(nm["id"], nm["id"])
         # manual overrides scraper
-        if nm["id"] in by_id:
-            by_id[nm["id"]].update({k: v for k, v in nm.items() if k not in ("source", "schema_version")})
+        if target in by_id:
+            merged = by_id[target]
+            merged.update({k: v for k, v in nm.items() if k not in ("id", "source", "schema_version")})
+            merged.update(display.derive(merged) or {})
         else:
             by_id[nm["id"]] = nm
+    for e in by_id.values():
+        e["content_hash"] = content_hash(e)
     return sorted(
         by_id.values(),
         key=lambda x: (x.get("date_start") or x.get("datetime_start") or "9999", x.get("title", ""))
     )
 
+# --- Métricas ----------------------------------------------------------------
+@contextmanager
+def stage(timings: dict, name: str):
+    """Acumula en timings[name] los segundos que tarda el bloque."""
+    t0 = time.monotonic()
+    try:
+        yield
+    finally:
+        timings[name] = round(timings.get(name, 0) + time.monotonic() - t0, 3)
+
+def count_by_type(events: list) -> dict:
+    by_type = {}
+    for ev in events:
+        t = ev.get("type", "?")
+        by_type[t] = by_type.get(t, 0) + 1
+    return by_type
+
+def append_history(path: str, record: dict, keep: int) -> None:
+    """Añade una línea JSON compacta y conserva solo las últimas `keep`."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            lines = [l for l in f.read().splitlines() if l.strip()]
+    except FileNotFoundError:
+        lines = []
+    lines.append(json.dumps(record, ensure_ascii=False, separators=(",", ":"), sort_keys=True))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines[-keep:]) + "\n")
+
+# --- Ejecución de scrapers ---------------------------------------------------
+def run_scraper(inst: dict, deadline: float):
+    """
+    Importa y ejecuta un scraper dentro de su plazo.
+    Devuelve (lista o None, métricas de la sede).
+    """
+    modname = f"scrapers.{inst['id']}"
+    m = http.Metrics()
+    t0 = time.monotonic()
+    info = {"ok": False}
+    res = None
+    try:
+        mod = importlib.import_module(modname)
+    except Exception as e:
+        print(f"[WARN] Cannot import {modname}: {e}")
+        info["error"] = f"import: {e}"
+        return None, info
+
+    try:
+        with http.deadline(deadline), http.metrics_scope(m):
+            res = mod.collect(inst)
+        info["ok"] = True
+    except Exception as e:
+        print(f"[ERROR] {inst['id']} scraper failed: {e}")
+        info["error"] = str(e)
+    info["wall_seconds"] = round(time.monotonic() - t0, 3)
+    info["events"] = len(res or [])
+    info["by_type"] = count_by_type(res or [])
+    info["http"] = m.as_dict()
+    return res, info
+
+def report(inst: dict, res: list):
+    print(f"[OK] {inst['id']} -> {len(res)} events (by type: {count_by_type(res)})")
+
+def collect_all(institutions: list, workers: int, deadline: float):
+    """
+    Ejecuta los scrapers en hilos daemon, como mucho `workers` a la vez.
+    Cada resultado se informa en cuanto termina (nadie espera al más lento) y la
+    lista final sigue el orden de institutions.yaml, sea cual sea el de llegada.
+    Devuelve (eventos, {id de sede: métricas}).
+    """
+    results = [None] * len(institutions)
+    runs = {inst["id"]: {"ok": False} for inst in institutions}
+    done: "queue.Queue[tuple]" = queue.Queue()
+    queued = list(enumerate(institutions))
+    running = {}   # índice -> instante de arranque
+
+    def task(i, inst):
+        try:
+            done.put((i, run_scraper(inst, deadline)))
+        except BaseException as ex:   # run_scraper ya captura los errores del scraper
+            done.put((i, (None, {"ok": False, "error": str(ex)})))
+
+    while queued or running:
+        while queued and len(running) < max(1, workers):
+            i, inst = queued.pop(0)
+            running[i] = time.monotonic()
+            # daemon: un scraper colgado no impide que el proceso termine
+            threading.Thread(target=copy_context().run, args=(task, i, inst),
+                             name=f"scraper-{inst['id']}", daemon=True).start()
+        try:
+            i, (res, info) = done.get(timeout=1)
+        except queue.Empty:
+            pass
+        else:
+            if running.pop(i, None) is not None:   # si no, ya se había abandonado
+                runs[institutions[i]["id"]] = info
+                if res is not None:
+                    results[i] = res
+                    report(institutions[i], res)
+        # Red de seguridad: el plazo ya recorta cada petición, pero si un
+        # scraper se queda atascado (p. ej. parseando) se abandona y su hueco
+        # pasa al siguiente; el hilo sigue vivo hasta que salga el proceso.
+        now = time.monotonic()
+        for i, t0 in list(running.items()):
+            if now - t0 > deadline + DEADLINE_GRACE:
+                print(f"[ERROR] {institutions[i]['id']} scraper timed out after {deadline:.0f}s")
+                runs[institutions[i]["id"]] = {"ok": False, "error": "timeout",
+                                               "wall_seconds": round(now - t0, 3)}
+                del running[i]
+                ABANDONED.add(institutions[i]["id"])
+
+    scraped = []
+    for res in results:
+        if res:
+            scraped.extend(res)
+    return scraped, runs
+
+def run_summary(run: dict) -> dict:
+    """Resumen de una ejecución para meta.json: modo, duración y, por sede, ok/eventos/tiempo."""
+    return {
+        "started_at": run["started_at"],
+        "finished_at": run["finished_at"],
+        "mode": run["mode"],
+        "seconds": round((datetime.fromisoformat(run["finished_at"])
+                          - datetime.fromisoformat(run["started_at"])).total_seconds(), 3),
+        "institutions": {
+            iid: {k: info[k] for k in ("ok", "events", "wall_seconds", "error") if k in info}
+            for iid, info in run["institutions"].items()
+        },
+    }
+
 # --- Main --------------------------------------------------------------------
-def main() -> int:
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Recolector de eventos culturales")
+    ap.add_argument("--workers", type=int, default=None,
+                    help="scrapers simultáneos (1 = secuencial)")
+    ap.add_argument("--per-host", type=int, default=None,
+                    help="peticiones simultáneas por host")
+    ap.add_argument("--deadline", type=float, default=None,
+                    help="plazo en segundos por scraper")
+    ap.add_argument("--no-cache", action="store_true",
+                    help="ignora la caché HTTP (.cache/http) y re-parsea todo")
+    ap.add_argument("--no-store", action="store_true",
+                    help="sin data/events.sqlite (se borra si existe)")
+    ap.add_argument("--no-enrich", action="store_true",
+                    help="no descarga las fichas de detalle de los eventos")
+    ap.add_argument("--no-thumbs", action="store_true",
+                    help="no genera miniaturas locales de las imágenes")
+    ap.add_argument("--force", action="store_true",
+                    help="reescribe los ficheros aunque el contenido no haya cambiado")
+    ap.add_argument("--reparse", nargs="?", const="latest", default=None, metavar="FECHA",
+                    help="sin red: re-parsea las instantáneas guardadas (las últimas, o "
+                         "las anteriores a FECHA en ISO, p. ej. 2025-10-01)")
+    return ap.parse_args(argv)
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
     ensure_data_files()
     cfg = load_yaml(CONFIG_PATH)
+    run_cfg = cfg.get("collect") or {}
 
-    scraped = []
-    active = 0
+    workers = args.workers or run_cfg.get("workers", DEFAULT_WORKERS)
+    deadline = args.deadline or run_cfg.get("deadline", DEFAULT_DEADLINE)
+    snaps_cfg = run_cfg.get("snapshots") or {}
+    snaps = None
+    if snaps_cfg.get("enabled", True) or args.reparse:
+        snaps = snapshots.SnapshotStore(
+            keep=snaps_cfg.get("keep", snapshots.DEFAULT_KEEP),
+            max_age_days=snaps_cfg.get("max_age_days", snapshots.DEFAULT_MAX_AGE_DAYS))
+    http.configure(per_host=args.per_host or run_cfg.get("per_host", DEFAULT_PER_HOST),
+                   cache_dir=None if args.no_cache else "",
+                   rate=run_cfg.get("rate_per_host", 0),
+                   snapshots=None if args.reparse else snaps)
 
-    for inst in cfg.get("institutions", []):
-        if not inst.get("enabled"):
-            continue
-        active += 1
+    # --reparse: scrapers, fichas y miniaturas leen de las instantáneas, no de la red
+    offline = ExitStack()
+    if args.reparse:
+        before = None if args.reparse == "latest" else args.reparse
+        offline.enter_context(http.replay(snaps.source(before)))
+        print(f"[OK] reparse -> snapshots {'latest' if before is None else 'before ' + before}")
 
-        modname = f"scrapers.{inst['id']}"
-        try:
-            mod = importlib.import_module(modname)
-        except Exception as e:
-            print(f"[WARN] Cannot import {modname}: {e}")
-            continue
+    institutions = [inst for inst in cfg.get("institutions", []) if inst.get("enabled")]
+    active = len(institutions)
+    started_at = datetime.now(timezone.utc).isoformat()
+    timings = {}
+    fetch = {}   # métricas HTTP de las etapas que no son por sede
 
-        try:
-            res = mod.collect(inst)
-        except Exception as e:
-            print(f"[ERROR] {inst['id']} scraper failed: {e}")
-            continue
+    with stage(timings, "scrape"):
+        scraped, runs = collect_all(institutions, workers, deadline)
+    if args.reparse and not scraped:
+        print("[ERR] reparse -> no events from snapshots; nothing written")
+        return 1
 
-        scraped.extend(res)
-        by_type = {}
-        for ev in res:
-            t = ev.get("type", "?")
-            by_type[t] = by_type.get(t, 0) + 1
-        print(f"[OK] {inst['id']} -> {len(res)} events (by type: {by_type})")
+    enrich_cfg = run_cfg.get("enrich") or {}
+    if enrich_cfg.get("enabled", True) and not args.no_enrich:
+        with stage(timings, "enrich"), http.metrics_scope(http.Metrics()) as m:
+            scraped = enrich.enrich(
+                scraped, institutions,
+                workers=enrich_cfg.get("workers", enrich.DEFAULT_WORKERS),
+                budget=enrich_cfg.get("budget", enrich.DEFAULT_BUDGET),
+                max_age_days=enrich_cfg.get("max_age_days", enrich.DEFAULT_MAX_AGE_DAYS),
+            )
+        fetch["enrich"] = m.as_dict()
 
     # Cargar manual
     try:
@@ -125,25 +407,123 @@ def main() -> int:
     except Exception:
         manual = []
 
-    merged = merge_events(scraped, manual)
+    thumbs_cfg = run_cfg.get("thumbs") or {}
+    if thumbs_cfg.get("enabled", True) and not args.no_thumbs:
+        with stage(timings, "thumbs"), http.metrics_scope(http.Metrics()) as m:
+            images.attach_thumbnails(
+                scraped + manual,
+                width=thumbs_cfg.get("width", images.DEFAULT_WIDTH),
+                workers=thumbs_cfg.get("workers", images.DEFAULT_WORKERS),
+                budget=thumbs_cfg.get("budget", images.DEFAULT_BUDGET),
+                offline=bool(args.reparse),
+            )
+        fetch["thumbs"] = m.as_dict()
+    offline.close()
 
-    # Escribir events.json
-    with open(EVENTS_PATH, "w", encoding="utf-8") as f:
-        json.dump(merged, f, ensure_ascii=False, indent=2)
+    if snaps is not None and not args.reparse:
+        snaps.flush()
+        print(f"[OK] snapshots -> {snaps.prune()} stale removed")
 
-    meta = {
-        "generated_at": datetime.now(timezone.utc).isoformat(),
-        "active_institutions": active,
-        "counts": {
-            "total": len(merged),
-            "scraped": len(scraped),
-            "manual": max(0, len(merged) - len(scraped)),
-        },
+    dedupe_cfg = run_cfg.get("dedupe") or {}
+    duplicates = []
+    with stage(timings, "merge"):
+        merged = merge_events(scraped, manual,
+                              auto_merge=float(dedupe_cfg.get("auto_merge", DEFAULT_AUTO_MERGE)),
+                              duplicates=duplicates)
+    if duplicates:
+        n_merged = sum(d["action"] == "merged" for d in duplicates)
+        print(f"[OK] duplicates -> {n_merged} merged, {len(duplicates) - n_merged} to review")
+
+    # ¿Ha cambiado algo respecto al events.json anterior?
+    with stage(timings, "diff"):
+        prev = load_previous(EVENTS_PATH)
+        new_hash = dataset_hash(merged)
+        delta = diff_events(prev, merged)
+    changed = any(delta.values()) or args.force
+    if changed:
+        print(f"[OK] delta: +{len(delta['added'])} -{len(delta['removed'])} ~{len(delta['modified'])}")
+    else:
+        print(f"[OK] no changes ({len(merged)} events, hash {new_hash[:12]}) -> events left untouched")
+
+    now = datetime.now(timezone.utc).isoformat()
+    if changed:
+        with stage(timings, "write"):
+            write_json(EVENTS_PATH, merged)
+            write_json(DELTA_PATH, {
+                "generated_at": now,
+                "previous_hash": dataset_hash([{"id": i, "content_hash": h} for i, h in prev.items()]),
+                "current_hash": new_hash,
+                **delta,
+            })
+            write_json(DUPLICATES_PATH, duplicates)
+
+    # Almacén SQLite con índices e histórico. La app lo usa si existe: desactivado
+    # se borra, para que no sirva eventos de una ejecución anterior.
+    if run_cfg.get("sqlite", True) and not args.no_store:
+        if changed or not os.path.exists(STORE_PATH):
+            with stage(timings, "store"):
+                store.write(STORE_PATH, merged,
+                            history_days=float(run_cfg.get("sqlite_history_days", store.DEFAULT_HISTORY_DAYS)))
+    elif os.path.exists(STORE_PATH):
+        os.remove(STORE_PATH)
+        print("[OK] store disabled -> data/events.sqlite removed")
+
+    # Índices de la app: se rehacen con los eventos (o si faltan o son de otra versión)
+    for name, path, build, version in (
+            ("search_index", SEARCH_PATH, search.build, search.INDEX_VERSION),
+            ("facets", FACETS_PATH, facets.build, facets.FACETS_VERSION),
+            ("occurrences", OCCURRENCES_PATH, occurrences.build, occurrences.INDEX_VERSION)):
+        if changed or index_version(path) != version:
+            with stage(timings, name):
+                write_json(path, build(merged), indent=None)
+
+    # Feeds .ics: cada uno se reescribe solo si cambian sus eventos
+    if run_cfg.get("feeds", True):
+        with stage(timings, "feeds"):
+            fs = feeds.write_all(FEEDS_DIR, merged)
+        print(f"[OK] feeds -> {fs['written']} written, {fs['kept']} unchanged, {fs['removed']} removed")
+
+    # Métricas de la ejecución: siempre, en .cache/metrics (fuera del repo)
+    run = {
+        "started_at": started_at,
+        "finished_at": now,
+        "changed": bool(changed),
+        "mode": "reparse" if args.reparse else "fetch",
+        "events": len(merged),
+        "by_type": count_by_type(merged),
+        "delta": {k: len(v) for k, v in delta.items()},
+        "duplicates": {a: sum(d["action"] == a for d in duplicates) for a in ("merged", "review")},
+        "stages": timings,
+        "institutions": runs,
+        "fetch": fetch,
     }
-    with open(META_PATH, "w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.makedirs(METRICS_DIR, exist_ok=True)
+    write_json(LAST_RUN_PATH, run)
+    append_history(METRICS_PATH, run, int(run_cfg.get("metrics_keep", DEFAULT_METRICS_KEEP)))
+
+    # meta.json va con los eventos: solo se reescribe si han cambiado, con un
+    # resumen de la ejecución que los produjo (el detalle queda en .cache/metrics)
+    if changed or not os.path.exists(META_PATH):
+        write_json(META_PATH, {
+            "generated_at": now,
+            "content_hash": new_hash,
+            "active_institutions": active,
+            "counts": {
+                "total": len(merged),
+                "scraped": len(scraped),
+                "manual": max(0, len(merged) - len(scraped)),
+            },
+            "run": run_summary(run),
+        })
 
     return 0
 
 if __name__ == "__main__":
-    raise SystemExit(main())
+    code = main()
+    if ABANDONED:
+        # Los pools internos de un scraper colgado no son daemon y el intérprete
+        # los esperaría al salir: todo está escrito, así que se sale sin esperar.
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+    raise SystemExit(code)
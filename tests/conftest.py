@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Utilidades comunes de los tests: un servidor HTTP local (http.server) con
+respuestas configurables y la caché de scrapers.http en una carpeta temporal.
+"""
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from scrapers import http  # noqa: E402
+
+
+class Site:
+    """
+    Páginas servidas por el servidor local: `pages[ruta] = (cuerpo, cabeceras)`.
+    Una ruta ausente da 404. Con ETag/Last-Modified responde 304 si la petición
+    condicional coincide. `requests` guarda (ruta, cabeceras) de cada petición.
+    """
+
+    def __init__(self):
+        self.pages = {}
+        self.requests = []
+        self.base = ""
+
+    def put(self, path: str, body, etag=None, last_modified=None):
+        headers = {"Content-Type": "text/html; charset=utf-8"}
+        if etag:
+            headers["ETag"] = etag
+        if last_modified:
+            headers["Last-Modified"] = last_modified
+        self.pages[path] = (body.encode("utf-8") if isinstance(body, str) else body, headers)
+
+    def url(self, path: str) -> str:
+        return self.base + path
+
+    def paths(self):
+        return [p for p, _ in self.requests]
+
+
+def _handler(site: Site):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            site.requests.append((self.path, dict(self.headers)))
+            page = site.pages.get(self.path)
+            if page is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            body, headers = page
+            etag, modified = headers.get("ETag"), headers.get("Last-Modified")
+            if ((etag and self.headers.get("If-None-Match") == etag)
+                    or (modified and self.headers.get("If-Modified-Since") == modified)):
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            for k, v in headers.items():
+                self.send_header(k, v)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+@pytest.fixture
+def site():
+    s = Site()
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(s))
+    s.base = f"http://127.0.0.1:{server.server_address[1]}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield s
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """Caché HTTP en tmp_path, sin ritmo por host ni instantáneas."""
+    http.configure(cache_dir=str(tmp_path / "http"), rate=0, snapshots=None)
+    try:
+        yield tmp_path / "http"
+    finally:
+        http.configure(cache_dir=http.DEFAULT_CACHE_DIR)
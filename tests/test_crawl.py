@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""Recorrido incremental de listados paginados (scrapers.crawl) contra un servidor local."""
+import json
+
+from scrapers import crawl, http
+
+PER_PAGE = 3
+
+
+def _publish(site, items, per_page=PER_PAGE):
+    """Publica `items` como listado paginado: /list, /list?page=1, ..."""
+    for path in [p for p in site.pages if p.startswith("/list")]:
+        del site.pages[path]
+    for n in range(0, (len(items) + per_page - 1) // per_page):
+        path = "/list" if n == 0 else f"/list?page={n}"
+        site.put(path, json.dumps(items[n * per_page:(n + 1) * per_page]))
+
+
+def _parse(html, url):
+    return [{"id": item, "title": item.upper()} for item in json.loads(html)]
+
+
+def _crawl(site, full_every_days=7):
+    urls = crawl.page_urls(site.url("/list"), site.url("/list?page={n}"), 1, 10)
+    site.requests.clear()
+    events = crawl.crawl("test.list", urls, _parse, key="test.v1", workers=1,
+                         full_every_days=full_every_days)
+    return [e["id"] for e in events]
+
+
+ITEMS = [f"e{i}" for i in range(9)]   # tres páginas de tres
+
+
+def test_first_crawl_reads_until_404(site, cache):
+    _publish(site, ITEMS)
+    assert _crawl(site) == ITEMS
+    assert site.paths() == ["/list", "/list?page=1", "/list?page=2", "/list?page=3"]
+
+
+def test_new_item_on_page_one_stops_early(site, cache):
+    _publish(site, ITEMS)
+    _crawl(site)
+
+    listing = ["new"] + ITEMS
+    _publish(site, listing)
+    # página 1 trae algo nuevo; la 2 ya es toda conocida: parada y el resto se arrastra
+    assert _crawl(site) == listing
+    assert site.paths() == ["/list", "/list?page=1"]
+    # el resultado coincide con un recorrido completo
+    assert _crawl(site, full_every_days=0) == listing
+
+
+def test_item_removed_in_the_middle_is_dropped(site, cache):
+    _publish(site, ITEMS)
+    _crawl(site)
+
+    # se retira e4 (mitad del listado) y entra uno nuevo al principio
+    listing = ["new"] + [i for i in ITEMS if i != "e4"]
+    _publish(site, listing)
+    assert _crawl(site) == listing
+    assert site.paths() == ["/list", "/list?page=1"]
+
+
+def test_unchanged_listing_costs_one_page(site, cache):
+    _publish(site, ITEMS)
+    _crawl(site)
+    assert _crawl(site) == ITEMS
+    assert site.paths() == ["/list"]
+
+
+def test_404_in_the_middle_carries_known_events(site, cache):
+    _publish(site, ITEMS)
+    _crawl(site)
+
+    listing = ["new"] + ITEMS
+    _publish(site, listing)
+    del site.pages["/list?page=1"]      # la página 2 falla de forma puntual
+    # no es el final del listado (antes había más páginas): se arrastra lo conocido
+    assert _crawl(site) == ["new", "e0", "e1"] + ITEMS[2:]
+
+    # en cuanto vuelve, un recorrido completo lee todas las páginas
+    _publish(site, listing)
+    assert _crawl(site, full_every_days=0) == listing
+
+
+def test_404_on_a_full_crawl_ends_the_listing(site, cache):
+    _publish(site, ITEMS)
+    _crawl(site)
+
+    _publish(site, ITEMS[:6])            # el listado se acorta de verdad
+    assert _crawl(site, full_every_days=0) == ITEMS[:6]
+
+
+def _replay(site, listing, **kw):
+    """Recorrido en replay: las páginas salen de `listing`, no del servidor."""
+    pages = {("/list" if n == 0 else f"/list?page={n}"): json.dumps(listing[n * PER_PAGE:(n + 1) * PER_PAGE])
+             for n in range((len(listing) + PER_PAGE - 1) // PER_PAGE)}
+    with http.replay(lambda url: (pages.get(url[len(site.base):]) or "").encode("utf-8") or None):
+        return _crawl(site, **kw)
+
+
+def test_replay_end_of_listing_is_complete(site, cache):
+    _publish(site, ITEMS[:3])
+    _crawl(site)
+    # una instantánea con un evento menos: el 404 de la página 2 es el final
+    # normal del listado, no se arrastra nada de la marca
+    assert _replay(site, ITEMS[:2], full_every_days=0) == ITEMS[:2]
+
+
+def test_replay_missing_snapshot_carries_known_events(site, cache):
+    _publish(site, ITEMS)
+    _crawl(site)
+    # falta la instantánea de la página 2 de un listado que tenía tres
+    assert _replay(site, ITEMS[:3], full_every_days=0) == ITEMS
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""Casi-duplicados entre manuales y scrapeados (common.dedupe y su fusión en collect.py)."""
+import importlib.util
+import os
+
+from common import dedupe, display
+
+# scripts/ no es un paquete: collect.py se carga por ruta
+_spec = importlib.util.spec_from_file_location(
+    "collect", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts", "collect.py"))
+collect = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(collect)
+
+
+def _event(eid, title, source="scraper", url=None, day="2025-10-08", **extra):
+    e = {"id": eid, "type": "activity", "institution_id": "mpm", "title": title, "url": url,
+         "datetime_start": f"{day}T18:00:00+02:00", "datetime_end": f"{day}T19:30:00+02:00",
+         "source": source}
+    e.update(extra)
+    e.update(display.derive(e) or {})
+    return e
+
+
+SCRAPED = [
+    _event("s1", "Concierto de guitarra flamenca", url="https://museo/actividades/guitarra"),
+    _event("s2", "Taller de grabado para familias"),
+    _event("s3", "Concierto de guitarra flamenca", day="2025-12-10"),   # otra fecha
+]
+
+
+def test_threshold():
+    manual = [_event("m1", "Concierto guitarra flamenca", source="manual"),   # 3 de 3 palabras
+              _event("m2", "Taller de cerámica para familias", source="manual")]  # 2 de 4
+    found = {m["id"]: m for m in dedupe.find_duplicates(manual, SCRAPED)}
+    assert found["m1"]["match_id"] == "s1" and found["m1"]["score"] == 1.0
+    assert found["m2"]["match_id"] == "s2" and found["m2"]["score"] == 0.5
+    assert "m2" not in {m["id"] for m in dedupe.find_duplicates(manual, SCRAPED, min_score=0.6)}
+
+
+def test_same_url_adds_a_bonus():
+    plain = _event("m1", "Guitarra flamenca en el museo", source="manual")
+    same_url = dict(plain, url="https://museo/actividades/guitarra")
+    base = dedupe.find_duplicates([plain], SCRAPED, min_score=0.1)[0]["score"]
+    bonus = dedupe.find_duplicates([same_url], SCRAPED, min_score=0.1)[0]["score"]
+    assert bonus == round(base + dedupe.URL_BONUS, 3)
+
+
+def test_other_dates_or_types_are_not_duplicates():
+    far = _event("m1", "Concierto de guitarra flamenca", source="manual", day="2025-11-01")
+    expo = _event("m2", "Concierto de guitarra flamenca", source="manual", type="exhibition")
+    assert dedupe.find_duplicates([far, expo], SCRAPED) == []
+
+
+def test_auto_merge_keeps_the_scraped_id():
+    manual = [{k: v for k, v in _event("m1", "Concierto guitarra flamenca", source="manual",
+                                       description="Con Paco").items() if k != "id"}]
+    duplicates = []
+    merged = collect.merge_events(SCRAPED, manual, auto_merge=0.85, duplicates=duplicates)
+    by_id = {e["id"]: e for e in merged}
+    assert len(merged) == len(SCRAPED)
+    assert by_id["s1"]["description"] == "Con Paco"       # manual > scraper
+    assert by_id["s1"]["source"] == "scraper"
+    assert [d["action"] for d in duplicates] == ["merged"]
+
+
+def test_below_auto_merge_is_listed_for_review():
+    manual = [_event("m2", "Taller de cerámica para familias", source="manual")]
+    duplicates = []
+    merged = collect.merge_events(SCRAPED, manual, auto_merge=0.85, duplicates=duplicates)
+    assert {e["id"] for e in merged} == {"s1", "s2", "s3", "m2"}
+    assert duplicates[0]["match_id"] == "s2" and duplicates[0]["action"] == "review"
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""Feeds iCalendar (common.feeds): plegado RFC 5545, UIDs estables y escritura incremental."""
+import os
+
+from common import feeds
+
+STAMP = "20251001T000000Z"
+
+
+def _event(eid, title="Visita", **extra):
+    e = {"id": eid, "type": "activity", "title": title, "institution_id": "mpm",
+         "institution_name": "Museo Picasso Málaga", "all_day": True,
+         "datetime_start": "2025-12-01T00:00:00+02:00", "datetime_end": "2025-12-05T23:59:00+02:00",
+         "content_hash": f"{eid}-{title}"}
+    e.update(extra)
+    return e
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _unfold(raw: bytes):
+    return raw.replace(b"\r\n ", b"").decode("utf-8").split("\r\n")
+
+
+def test_long_lines_are_folded_at_75_octets(tmp_path):
+    title = "Conferencia sobre Picasso y la cerámica de Vallauris " * 4 + "ñ€"
+    path = str(tmp_path / "all.ics")
+    feeds.write_feed(path, "Prueba", [_event("a", title)], STAMP)
+    raw = _read(path)
+    lines = raw.split(b"\r\n")
+    assert all(len(line) <= 75 for line in lines)
+    assert any(line.startswith(b" ") for line in lines)       # hay continuaciones
+    assert f"SUMMARY:{title}" in _unfold(raw)                  # y se despliegan sin perder nada
+
+
+def test_uid_is_stable_and_all_day_dates_are_published_days():
+    e = _event("abc123")
+    lines = feeds.vevent(e, STAMP)
+    assert "UID:abc123@malaga-cultura" in lines
+    assert feeds.vevent(dict(e, title="Otro título"), STAMP)[1] == lines[1]
+    # día completo: DTEND exclusivo, sin desfase horario
+    assert "DTSTART;VALUE=DATE:20251201" in lines
+    assert "DTEND;VALUE=DATE:20251206" in lines
+
+
+def test_unchanged_feeds_are_not_rewritten(tmp_path):
+    events = [_event("a"), _event("b", type="exhibition")]
+    first = feeds.write_all(str(tmp_path), events)
+    assert first == {"written": 4, "kept": 0, "removed": 0}   # all, sede y dos tipos
+    before = {p.name: p.stat().st_mtime_ns for p in tmp_path.iterdir()}
+
+    assert feeds.write_all(str(tmp_path), events) == {"written": 0, "kept": 4, "removed": 0}
+    assert {p.name: p.stat().st_mtime_ns for p in tmp_path.iterdir()} == before
+
+    # sin su .etag el feed se regenera
+    os.remove(tmp_path / "type-exhibition.ics.etag")
+    assert feeds.write_all(str(tmp_path), events) == {"written": 1, "kept": 3, "removed": 0}
+    assert (tmp_path / "type-exhibition.ics.etag").exists()
+
+    # un cambio en la actividad solo toca sus feeds
+    events[0]["content_hash"] = "cambiado"
+    assert feeds.write_all(str(tmp_path), events) == {"written": 3, "kept": 1, "removed": 0}
+    # sin exposiciones su feed se borra
+    assert feeds.write_all(str(tmp_path), events[:1]) == {"written": 2, "kept": 1, "removed": 1}
+    assert not (tmp_path / "type-exhibition.ics").exists()
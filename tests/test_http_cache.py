@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""Caché condicional de scrapers.http (fetch_parsed) contra un servidor local."""
+from scrapers import http
+
+
+class Parser:
+    """parse(html) que cuenta sus llamadas."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, html):
+        self.calls += 1
+        return {"length": len(html), "call": self.calls}
+
+
+def _fetch(url, parse, key="test.v1", max_age=None):
+    m = http.Metrics()
+    with http.metrics_scope(m):
+        result = http.fetch_parsed(url, parse, key=key, max_age=max_age)
+    return result, m.as_dict()
+
+
+def test_sends_validators_and_reuses_parse_on_304(site, cache):
+    site.put("/page", "<p>hola</p>", etag='"v1"', last_modified="Wed, 01 Oct 2025 10:00:00 GMT")
+    parse = Parser()
+
+    first, _ = _fetch(site.url("/page"), parse)
+    assert parse.calls == 1
+    # la primera petición no es condicional (no hay nada que reutilizar)
+    headers = site.requests[0][1]
+    assert "If-None-Match" not in headers and "If-Modified-Since" not in headers
+
+    second, metrics = _fetch(site.url("/page"), parse)
+    headers = site.requests[1][1]
+    assert headers["If-None-Match"] == '"v1"'
+    assert headers["If-Modified-Since"] == "Wed, 01 Oct 2025 10:00:00 GMT"
+    assert metrics["status"] == {"304": 1}
+    assert metrics["not_modified"] == 1
+    assert parse.calls == 1
+    assert second == first
+
+
+def test_unchanged_body_skips_parse(site, cache):
+    # sin validadores: el servidor responde siempre 200 con el mismo cuerpo
+    site.put("/page", "<p>igual</p>")
+    parse = Parser()
+
+    first, _ = _fetch(site.url("/page"), parse)
+    second, metrics = _fetch(site.url("/page"), parse)
+    assert metrics["status"] == {"200": 1}
+    assert metrics["reused"] == 1
+    assert parse.calls == 1
+    assert second == first
+
+
+def test_changed_body_is_parsed_again(site, cache):
+    site.put("/page", "<p>uno</p>")
+    parse = Parser()
+    _fetch(site.url("/page"), parse)
+
+    site.put("/page", "<p>otro más largo</p>")
+    second, metrics = _fetch(site.url("/page"), parse)
+    assert parse.calls == 2
+    assert second == {"length": len("<p>otro más largo</p>"), "call": 2}
+    assert metrics["reused"] == 0
+
+
+def test_changed_key_forces_reparse(site, cache):
+    site.put("/page", "<p>hola</p>", etag='"v1"')
+    parse = Parser()
+    _fetch(site.url("/page"), parse, key="test.v1")
+
+    # otra versión del parser: sin petición condicional y parseo nuevo
+    second, metrics = _fetch(site.url("/page"), parse, key="test.v2")
+    assert "If-None-Match" not in site.requests[1][1]
+    assert metrics["status"] == {"200": 1}
+    assert parse.calls == 2
+    assert second["call"] == 2
+
+
+def test_max_age_skips_the_request(site, cache):
+    site.put("/page", "<p>hola</p>")
+    parse = Parser()
+    _fetch(site.url("/page"), parse)
+
+    _, metrics = _fetch(site.url("/page"), parse, max_age=3600)
+    assert len(site.requests) == 1
+    assert metrics["fresh_hits"] == 1
+
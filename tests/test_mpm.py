@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""Parseo de actividades de scrapers.mpm: fechas corregidas con ids estables."""
+import hashlib
+
+from scrapers import mpm
+
+CARD = ('<div class="color-card-container three-columns">'
+        '<a class="colorCard" href="/actividades/act-26"><p class="p2">{dates}</p>'
+        '<h2 class="h5">Ciclo de cine</h2></a></div>')
+
+
+def _activity(dates):
+    events = mpm.parse_activities(CARD.format(dates=dates))
+    assert len(events) == 1
+    return events[0]
+
+
+def _id(start, end):
+    key = f"activity|mpm|{mpm.BASE}/actividades/act-26|{start}T00:00:00+02:00|{end}T23:59:00+02:00"
+    return hashlib.sha1(key.lower().encode("utf-8")).hexdigest()
+
+
+def test_month_range_across_the_year_keeps_its_id():
+    e = _activity("septiembre – enero 2025")
+    assert e["datetime_start"][:10] == "2024-09-01"
+    assert e["datetime_end"][:10] == "2025-01-31"
+    # el id se sigue calculando con las fechas de la primera gramática
+    assert e["id"] == _id("2025-09-01", "2025-01-28")
+
+
+def test_plain_range_id_uses_its_dates():
+    e = _activity("3 - 5 diciembre 2025")
+    assert e["id"] == _id("2025-12-03", "2025-12-05")
+
+
+def test_form_unknown_to_the_first_grammar_uses_the_new_dates():
+    e = _activity("1 de octubre de 2025")
+    assert e["id"] == _id("2025-10-01", "2025-10-01")
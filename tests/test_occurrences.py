@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""Índice de ocurrencias por día (common.occurrences)."""
+from common import display, occurrences
+
+
+def _activity(eid, start, end, **extra):
+    e = {"id": eid, "type": "activity", "all_day": True,
+         "datetime_start": start + "T00:00:00+02:00", "datetime_end": end + "T23:59:00+02:00"}
+    e.update(extra)
+    e.update(display.derive(e) or {})
+    return e
+
+
+def _index(*events):
+    return occurrences.OccurrenceIndex(occurrences.build(events))
+
+
+def test_winter_activity_is_indexed_on_its_published_days():
+    # en diciembre Madrid va a +01:00: el +02:00 fijo no debe mover el día
+    idx = _index(_activity("dic", "2025-12-01", "2025-12-05"))
+    assert idx.between("2025-11-30", "2025-11-30") == set()
+    assert idx.between("2025-12-01", "2025-12-01") == {"dic"}
+    assert idx.between("2025-12-05", "2025-12-05") == {"dic"}
+    assert idx.between("2025-12-06", "2025-12-06") == set()
+
+
+def test_listed_days_only():
+    idx = _index(_activity("lista", "2025-12-01", "2025-12-15",
+                           occurrences=["2025-12-01", "2025-12-08", "2025-12-15"]))
+    assert idx.between("2025-12-08", "2025-12-08") == {"lista"}
+    assert idx.between("2025-12-02", "2025-12-07") == set()
+
+
+def test_long_span_is_found_from_any_month():
+    idx = _index({"id": "expo", "type": "exhibition",
+                  "date_start": "2025-10-15", "date_end": "2026-03-01"},
+                 _activity("corta", "2026-01-10", "2026-01-10"))
+    assert idx.between("2026-01-10", "2026-01-10") == {"expo", "corta"}
+    assert idx.between("2026-03-02", "2026-03-09") == set()
+    assert idx.between("2025-10-01", "2025-10-15") == {"expo"}
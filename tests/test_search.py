@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Búsqueda de la app (common.search): prefijos, AND y sin tildes ni mayúsculas."""
+from common import search
+
+EVENTS = [
+    {"id": "a", "title": "Picasso y la cerámica", "institution_name": "Museo Picasso Málaga"},
+    {"id": "b", "title": "Concierto de guitarra", "description": "Obras de Albéniz",
+     "institution_name": "Centre Pompidou Málaga"},
+    {"id": "c", "title": "Taller de grabado", "institution_name": "Museo Picasso Málaga"},
+]
+INDEX = search.build(EVENTS)
+
+
+def test_prefix():
+    assert search.search(INDEX, "pica") == {"a", "c"}
+    assert search.search(INDEX, "guit") == {"b"}
+
+
+def test_words_are_combined_with_and():
+    assert search.search(INDEX, "picasso taller") == {"c"}
+    assert search.search(INDEX, "picasso guitarra") == set()
+
+
+def test_accents_and_case_are_folded():
+    assert search.search(INDEX, "CERAMICA") == {"a"}
+    assert search.search(INDEX, "albéniz") == {"b"}
+    assert search.search(INDEX, "MÁLAGA") == {"a", "b", "c"}
+
+
+def test_empty_query_means_no_filter():
+    assert search.search(INDEX, "") is None
+    assert search.search(INDEX, " ¿? ") is None
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""Almacén SQLite (common.store): histórico acotado y consultas por ventana."""
+from datetime import datetime, timedelta, timezone
+
+from common import store
+
+NOW = 1_760_000_000
+
+
+def _event(eid, seen_days_ago=0, **extra):
+    seen = datetime.now(timezone.utc) - timedelta(days=seen_days_ago)
+    e = {"id": eid, "type": "activity", "institution_id": "mpm", "title": eid,
+         "ts_start": NOW, "ts_end": NOW + 3600, "last_seen_at": seen.isoformat()}
+    e.update(extra)
+    return e
+
+
+def _ids(path, **kw):
+    conn = store.connect(str(path))
+    try:
+        return sorted(e["id"] for e in store.upcoming(conn, NOW, show_past=True, limit=100, **kw))
+    finally:
+        conn.close()
+
+
+def test_retired_events_are_kept_then_purged(tmp_path):
+    path = tmp_path / "events.sqlite"
+    store.write(str(path), [_event("a", seen_days_ago=10), _event("b", seen_days_ago=400)])
+    # los dos dejan de aparecer: "a" se queda como histórico, "b" ya es demasiado antiguo
+    store.write(str(path), [_event("c")], history_days=365)
+    conn = store.connect(str(path))
+    rows = dict(conn.execute("SELECT id, active FROM events").fetchall())
+    conn.close()
+    assert rows == {"a": 0, "c": 1}
+
+
+def test_facets_and_ids_filter(tmp_path):
+    path = tmp_path / "events.sqlite"
+    store.write(str(path), [_event("a"), _event("b", type="exhibition"), _event("c", institution_id="cac")])
+    assert _ids(path, types=["exhibition"]) == ["b"]
+    assert _ids(path, institutions=["mpm"]) == ["a", "b"]
+    assert _ids(path, ids={"a", "c"}) == ["a", "c"]